@@ -0,0 +1,107 @@
+"""Authenticate and lookup throughput of AuthManager, before and after QUERIES.
+
+"str.format" is the previous implementation, which built a new SQL text
+for every call, so the connection's statement cache never hit and each
+call parsed and planned its query again. "parameterised" runs the
+current AuthManager, with the statement cache of main.connect() and
+with it disabled (cached_statements=0) to show what the cache alone is
+worth. The password KDF is set to a single PBKDF2 round and run in the
+calling thread, so only the statements are measured; bench_login.py
+measures the KDF.
+
+    python bench_auth.py --users 10000 --calls 50000
+"""
+import argparse
+import random
+import sqlite3
+import time
+from concurrent.futures import Executor, Future
+
+from main import QUERIES, AuthManager, PasswordHasher, connect
+
+NO_KDF = PasswordHasher("pbkdf2_sha256", i=1)
+
+
+class InlineExecutor(Executor):
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class FormattedAuthManager(AuthManager):
+    """The lookups as they were before QUERIES: one SQL text per call."""
+
+    def authenticate_user(self, username, password):
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT * FROM users
+            WHERE username = '{}' AND password = '{}'
+        """.format(username, password))
+        return cursor.fetchone()
+
+    def get_user_by_id(self, user_id):
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT * FROM users WHERE id = {}
+        """.format(user_id))
+        return cursor.fetchone()
+
+    def count_users_by_country(self, country):
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) FROM users WHERE country = '{}'
+        """.format(country))
+        return cursor.fetchone()[0]
+
+
+CASES = [
+    ("str.format", FormattedAuthManager, connect),
+    ("parameterised, no cache", AuthManager, lambda database: connect(database, cached_statements=0)),
+    ("parameterised", AuthManager, connect),
+]
+COUNTRIES = ["CountryA", "CountryB", "CountryC", "CountryD"]
+
+
+def seed(manager: AuthManager, users: int):
+    rows = ((f"user{i}", f"password{i}", COUNTRIES[i % len(COUNTRIES)], 1000) for i in range(users))
+    if isinstance(manager, FormattedAuthManager):
+        # Passwords in plain text, as the formatted query compares them in SQL
+        with manager.connection:
+            manager.connection.executemany(QUERIES["insert_user"], rows)
+    else:
+        manager.register_users(rows)
+
+
+def throughput(call, arguments) -> float:
+    started = time.perf_counter()
+    for args in arguments:
+        call(*args)
+    return len(arguments) / (time.perf_counter() - started)
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    picks = [rng.randrange(args.users) for _ in range(args.calls)]
+    operations = {
+        "authenticate_user": [(f"user{i}", f"password{i}") for i in picks],
+        "get_user_by_id": [(i + 1,) for i in picks],
+        "count_users_by_country": [(COUNTRIES[i % len(COUNTRIES)],) for i in picks[:args.calls // 10]],
+    }
+    print(f"SQLite {sqlite3.sqlite_version}, {args.users} users, {args.calls} calls per lookup")
+    print(f"{'case':>24} " + " ".join(f"{name:>23}" for name in operations) + "  (calls/s)")
+    for name, manager_class, open_database in CASES:
+        manager = manager_class(open_database(":memory:"), hasher=NO_KDF, executor=InlineExecutor())
+        seed(manager, args.users)
+        rates = [throughput(getattr(manager, operation), arguments)
+                 for operation, arguments in operations.items()]
+        print(f"{name:>24} " + " ".join(f"{rate:>23.0f}" for rate in rates))
+        manager.connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--calls", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    run(parser.parse_args())
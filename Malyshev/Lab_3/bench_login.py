@@ -0,0 +1,80 @@
+"""Logins per second per core for each password KDF setting.
+
+For every --kdf setting, registers --users users in a fresh database
+file and runs --logins authenticate_user calls from --threads client
+threads. Each client has its own connection, and all of them share one
+KDF pool: kdf_pool() with a thread per core, or a process pool with
+--processes. A login is one KDF evaluation, so logins/s per core is the
+figure to size a deployment with: peak logins/s divided by it gives the
+number of cores the password checks need. "ms/hash" is a single KDF
+evaluation on an idle machine.
+
+    python bench_login.py --kdf scrypt:n=16384,r=8,p=1 pbkdf2_sha256:i=600000 --logins 200
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_register import parse_kdf
+from main import AuthManager, connect, kdf_pool
+
+DEFAULT_SETTINGS = ["scrypt:n=16384,r=8,p=1", "scrypt:n=32768,r=8,p=1", "scrypt:n=65536,r=8,p=1",
+                    "pbkdf2_sha256:i=100000", "pbkdf2_sha256:i=310000", "pbkdf2_sha256:i=600000"]
+
+
+def hash_ms(hasher, repeat: int = 3) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hasher.hash("password")
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def logins_per_second(path: str, hasher, executor, users: int, logins: int, threads: int) -> float:
+    manager = AuthManager(connect(path), hasher=hasher, executor=executor)
+    manager.register_users((f"user{i}", f"password{i}", "CountryA", 0) for i in range(users))
+    manager.connection.close()
+
+    def client(count: int, offset: int):
+        client_manager = AuthManager(connect(path), hasher=hasher, executor=executor)
+        for i in range(offset, offset + count):
+            assert client_manager.authenticate_user(f"user{i % users}", f"password{i % users}") is not None
+        client_manager.connection.close()
+
+    per_thread = logins // threads
+    workers = [threading.Thread(target=client, args=(per_thread, n * per_thread)) for n in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def run(args):
+    cores = os.cpu_count() or 1
+    executor = ProcessPoolExecutor(cores) if args.processes else kdf_pool()
+    print(f"{cores} cores, {args.threads} client threads, "
+          f"{'process' if args.processes else 'thread'} pool of {cores}, {args.logins} logins per setting")
+    print(f"{'kdf':>28} {'ms/hash':>8} {'logins/s':>9} {'per core':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for hasher in args.kdf:
+            rate = logins_per_second(os.path.join(tmp, f"{hasher.algorithm}-{len(os.listdir(tmp))}.db"),
+                                     hasher, executor, args.users, args.logins, args.threads)
+            print(f"{str(hasher):>28} {hash_ms(hasher):>8.1f} {rate:>9.1f} {rate / cores:>9.1f}")
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kdf", type=parse_kdf, nargs="+", default=[parse_kdf(s) for s in DEFAULT_SETTINGS])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=2 * (os.cpu_count() or 1))
+    parser.add_argument("--processes", action="store_true", help="run the KDF in a process pool")
+    run(parser.parse_args())
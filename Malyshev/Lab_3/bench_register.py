@@ -0,0 +1,81 @@
+"""Registration throughput: register_user per row against register_users in chunks.
+
+Each case loads synthetic users into a fresh database file with the
+default rollback journal and synchronous=FULL, so a transaction costs a
+few fsyncs. register_user commits every row and only runs --single
+users. register_users streams --users users through executemany, one
+transaction per chunk, for each --chunk-size. --duplicates puts that
+fraction of repeated usernames into the stream: every chunk that
+contains one is rolled back and replayed row by row. Passwords are
+hashed with --kdf (default: one PBKDF2 round, i.e. the cost of storage
+alone; see bench_login.py for the cost of real settings).
+
+    python bench_register.py --users 1000000 --chunk-size 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from main import AuthManager, PasswordHasher, connect
+
+
+def synthetic_users(count: int, duplicates: float, seed: int):
+    rng = random.Random(seed)
+    for i in range(count):
+        name = f"user{rng.randrange(i)}" if i and rng.random() < duplicates else f"user{i}"
+        yield name, f"password{i}", f"Country{i % 50}", 1000.0
+
+
+def parse_kdf(text: str) -> PasswordHasher:
+    algorithm, _, params = text.partition(":")
+    return PasswordHasher(algorithm, **{name: int(value) for name, value in
+                                        (item.split("=") for item in params.split(",") if item)})
+
+
+def timed(tmp: str, name: str, load, hasher: PasswordHasher) -> float:
+    path = os.path.join(tmp, f"{name}.db")
+    connection = connect(path)
+    manager = AuthManager(connection, hasher=hasher)
+    started = time.perf_counter()
+    load(manager)
+    elapsed = time.perf_counter() - started
+    connection.close()
+    os.remove(path)
+    return elapsed
+
+
+def run(args):
+    print(f"SQLite {sqlite3.sqlite_version}, {args.duplicates:.1%} duplicate usernames, KDF {args.kdf}")
+    print(f"{'case':>24} {'users':>9} {'seconds':>8} {'users/s':>10} {'failures':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        def per_row(manager):
+            for user in synthetic_users(args.single, args.duplicates, args.seed):
+                try:
+                    manager.register_user(*user)
+                except sqlite3.IntegrityError:
+                    pass
+        elapsed = timed(tmp, "single", per_row, args.kdf)
+        print(f"{'register_user':>24} {args.single:>9} {elapsed:>8.2f} {args.single / elapsed:>10.0f} {'-':>9}")
+
+        for chunk_size in args.chunk_size:
+            results = []
+            elapsed = timed(tmp, f"chunk-{chunk_size}", lambda manager: results.append(
+                manager.register_users(synthetic_users(args.users, args.duplicates, args.seed), chunk_size)),
+                args.kdf)
+            print(f"{f'register_users({chunk_size})':>24} {args.users:>9} {elapsed:>8.2f} "
+                  f"{args.users / elapsed:>10.0f} {len(results[0].failures):>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--single", type=int, default=2000, help="users registered one per call")
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--duplicates", type=float, default=0.0)
+    parser.add_argument("--kdf", type=parse_kdf, default=parse_kdf("pbkdf2_sha256:i=1"),
+                        help="password hashing, e.g. scrypt:n=16384,r=8,p=1")
+    parser.add_argument("--seed", type=int, default=1)
+    run(parser.parse_args())
@@ -1,14 +1,280 @@
+import base64
+import hashlib
+import hmac
+import os
 import pytest
+import random
+import secrets
 import sqlite3
 import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import List, NamedTuple, Tuple
+
+# Размер кэша подготовленных выражений соединения (LRU по тексту запроса)
+STATEMENT_CACHE_SIZE = 32
+
+# Все запросы AuthManager: текст постоянный, значения передаются через "?",
+# поэтому каждый запрос разбирается один раз на соединение и дальше берется
+# из кэша выражений sqlite3, а введенные данные не могут изменить сам запрос.
+# Кэш соединения должен вмещать их все, иначе они вытесняют друг друга
+QUERIES = {
+    "insert_user": "INSERT INTO users (username, password, country, balance) VALUES (?, ?, ?, ?)",
+    "user_by_name": "SELECT * FROM users WHERE username = ?",
+    # Новый хеш пишется, только если пароль не сменили после проверки
+    "rehash_password": "UPDATE users SET password = ? WHERE id = ? AND password = ?",
+    "delete_user": "DELETE FROM users WHERE id = ?",
+    "user_by_id": "SELECT * FROM users WHERE id = ?",
+    "count_by_country": "SELECT COUNT(*) FROM users WHERE country = ?",
+    # Проверка средств в самом UPDATE: строка меняется, только если баланса хватает
+    "withdraw": "UPDATE users SET balance = balance - ? WHERE id = ? AND balance >= ?",
+    "deposit": "UPDATE users SET balance = balance + ? WHERE id = ?",
+    "insert_session": "INSERT INTO sessions (token_hash, user_id, expires_at) VALUES (?, ?, ?)",
+    "session": "SELECT user_id, expires_at FROM sessions WHERE token_hash = ?",
+    "delete_session": "DELETE FROM sessions WHERE token_hash = ?",
+    "delete_user_sessions": "DELETE FROM sessions WHERE user_id = ?",
+    "sweep_sessions": "DELETE FROM sessions WHERE expires_at <= ?",
+}
+
+
+# Пользователей на одну транзакцию в register_users
+REGISTER_CHUNK_SIZE = 10000
+
+
+class RegistrationResult(NamedTuple):
+    """Итог register_users: число добавленных и (номер, имя, ошибка) для отклоненных"""
+    inserted: int
+    failures: List[Tuple[int, str, str]]
+
+
+class TransferResult(NamedTuple):
+    """Итог transfer_many: число проведенных переводов и (номер, ошибка) для остальных"""
+    applied: int
+    failures: List[Tuple[int, str]]
+
+
+# Параметры KDF по умолчанию. Хеш хранится в колонке password вместе с
+# алгоритмом и параметрами: "scrypt$n=32768,r=8,p=1$<соль>$<хеш>", так что
+# строки с разными настройками уживаются в одной таблице
+KDF_DEFAULTS = {
+    "scrypt": {"n": 2 ** 15, "r": 8, "p": 1},
+    "pbkdf2_sha256": {"i": 600000},
+}
+SALT_BYTES = 16
+
+
+class PasswordHasher:
+    """Хеширование паролей через scrypt или PBKDF2 из hashlib.
+
+    hash() возвращает строку с алгоритмом, параметрами, солью и хешем,
+    verify() проверяет пароль по такой строке с ее собственными
+    параметрами, а needs_rehash() сообщает, что строка получена с другими
+    настройками (или это пароль в открытом виде из старых записей) и ее
+    стоит пересчитать. Объект можно передавать в пул процессов.
+    """
+
+    def __init__(self, algorithm="scrypt", **params):
+        if algorithm not in KDF_DEFAULTS:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+        unknown = set(params) - set(KDF_DEFAULTS[algorithm])
+        if unknown:
+            raise ValueError(f"Unknown {algorithm} parameters: {sorted(unknown)}")
+        self.algorithm = algorithm
+        self.params = {**KDF_DEFAULTS[algorithm], **params}
+
+    def __repr__(self):
+        return f"{self.algorithm}:{format_params(self.params)}"
+
+    def hash(self, password, salt=None):
+        salt = os.urandom(SALT_BYTES) if salt is None else salt
+        digest = derive(self.algorithm, self.params, password, salt)
+        return "$".join([self.algorithm, format_params(self.params),
+                         base64.b64encode(salt).decode(), base64.b64encode(digest).decode()])
+
+    def verify(self, password, encoded):
+        parsed = parse_hash(encoded)
+        if parsed is None:
+            # Старая запись с паролем в открытом виде
+            return hmac.compare_digest(password.encode(), encoded.encode())
+        algorithm, params, salt, digest = parsed
+        return hmac.compare_digest(derive(algorithm, params, password, salt), digest)
+
+    def needs_rehash(self, encoded):
+        parsed = parse_hash(encoded)
+        return parsed is None or (parsed[0], parsed[1]) != (self.algorithm, self.params)
+
+
+def format_params(params):
+    return ",".join(f"{name}={value}" for name, value in params.items())
+
+
+def parse_hash(encoded):
+    """(алгоритм, параметры, соль, хеш) из строки PasswordHasher.hash() или None"""
+    parts = encoded.split("$")
+    if len(parts) != 4 or parts[0] not in KDF_DEFAULTS:
+        return None
+    try:
+        params = {name: int(value) for name, value in (item.split("=") for item in parts[1].split(","))}
+        return parts[0], params, base64.b64decode(parts[2]), base64.b64decode(parts[3])
+    except ValueError:
+        return None
+
+
+def derive(algorithm, params, password, salt):
+    if algorithm == "scrypt":
+        n, r, p = params["n"], params["r"], params["p"]
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=32,
+                              maxmem=128 * r * (n + p) + 1024 * 1024)
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, params["i"])
+
+
+def hash_passwords(hasher, passwords):
+    """Хеши для списка паролей: одна задача пула на часть пачки, а не на пароль"""
+    return [hasher.hash(password) for password in passwords]
+
+
+DEFAULT_HASHER = PasswordHasher()
+
+_kdf_pool = None
+_kdf_pool_lock = threading.Lock()
+
+
+def kdf_pool():
+    """Общий пул для вычисления KDF, по потоку на ядро
+
+    hashlib считает scrypt и PBKDF2 без GIL, поэтому потоки работают
+    параллельно, а ограничение пула не дает наплыву входов занять
+    процессор целиком в ущерб остальной работе.
+    """
+    global _kdf_pool
+    with _kdf_pool_lock:
+        if _kdf_pool is None:
+            _kdf_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="kdf")
+        return _kdf_pool
+
+
+# Сессии: время жизни токена, размер кэша в памяти и срок, после которого
+# запись кэша перечитывается из таблицы (так отзыв сессии из другого
+# процесса доходит до этого не позже чем через SESSION_CACHE_TTL секунд)
+SESSION_TTL = 3600.0
+SESSION_CACHE_SIZE = 100000
+SESSION_CACHE_TTL = 60.0
+
+
+def token_key(token):
+    """Ключ сессии: в таблице хранится SHA-256 токена, а не сам токен"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionStore:
+    """Непрозрачные токены сессий: LRU с TTL в памяти поверх таблицы sessions.
+
+    issue() пишет сессию в таблицу сразу (write-through) и кладет ее в
+    кэш, поэтому проверка горячего токена - один хеш и поиск в словаре,
+    без запроса к базе. Токен, которого нет в кэше, ищется в таблице.
+    Истекшие сессии удаляются из таблицы одним запросом в sweep(). Как и
+    AuthManager, хранилище работает с одним соединением из одного потока.
+    """
+
+    def __init__(self, connection, ttl=SESSION_TTL, max_size=SESSION_CACHE_SIZE,
+                 cache_ttl=SESSION_CACHE_TTL, clock=time.time):
+        self.connection = connection
+        self.ttl = ttl
+        self.max_size = max_size
+        self.cache_ttl = cache_ttl
+        self.clock = clock
+        self._cache = OrderedDict()  # ключ -> (user_id, истекает, перечитать после)
+        self._by_user = {}  # user_id -> ключи его сессий в кэше
+        self.hits = 0
+        self.misses = 0
+
+    def issue(self, user_id):
+        token = secrets.token_urlsafe(32)
+        key, expires_at = token_key(token), self.clock() + self.ttl
+        with self.connection:
+            self.connection.execute(QUERIES["insert_session"], (key, user_id, expires_at))
+        self._remember(key, user_id, expires_at)
+        return token
+
+    def validate(self, token):
+        """user_id сессии или None, если токен неизвестен, отозван или истек"""
+        key, now = token_key(token), self.clock()
+        entry = self._cache.get(key)
+        if entry is not None:
+            if now < entry[1] and now < entry[2]:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._forget(key)
+        self.misses += 1
+        row = self.connection.execute(QUERIES["session"], (key,)).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        self._remember(key, row[0], row[1])
+        return row[0]
+
+    def revoke(self, token):
+        key = token_key(token)
+        with self.connection:
+            self.connection.execute(QUERIES["delete_session"], (key,))
+        self._forget(key)
+
+    def revoke_user(self, user_id):
+        with self.connection:
+            self.connection.execute(QUERIES["delete_user_sessions"], (user_id,))
+        for key in self._by_user.pop(user_id, ()):
+            self._cache.pop(key, None)
+
+    def sweep(self):
+        """Удаление всех истекших сессий; возвращает число удаленных строк"""
+        now = self.clock()
+        with self.connection:
+            deleted = self.connection.execute(QUERIES["sweep_sessions"], (now,)).rowcount
+        for key in [key for key, entry in self._cache.items() if entry[1] <= now]:
+            self._forget(key)
+        return deleted
+
+    def _remember(self, key, user_id, expires_at):
+        if self.max_size <= 0:
+            return
+        self._cache[key] = (user_id, expires_at, self.clock() + self.cache_ttl)
+        self._cache.move_to_end(key)
+        self._by_user.setdefault(user_id, set()).add(key)
+        while len(self._cache) > self.max_size:
+            self._forget(next(iter(self._cache)))
+
+    def _forget(self, key):
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry[0])
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry[0]]
+
+
+def connect(database, cached_statements=STATEMENT_CACHE_SIZE):
+    """Открытие соединения с кэшем подготовленных выражений заданного размера"""
+    return sqlite3.connect(database, cached_statements=cached_statements)
+
 
 class AuthManager:
-    def __init__(self, connection):
+    def __init__(self, connection, hasher=DEFAULT_HASHER, executor=None, sessions=None):
+        """hasher задает KDF для новых и пересчитываемых паролей, executor -
+        пул для его вычисления (по умолчанию kdf_pool(), подойдет и
+        ProcessPoolExecutor), sessions - хранилище токенов сессий"""
         self.connection = connection
+        self.hasher = hasher
+        self.executor = executor or kdf_pool()
+        self.sessions = sessions or SessionStore(connection)
+        self._dummy_hash = None
         self.create_tables()
 
     def create_tables(self):
-        """Создание таблицы пользователей в базе данных"""
+        """Создание таблиц пользователей и сессий в базе данных"""
         with self.connection:
             self.connection.execute("""
                 CREATE TABLE IF NOT EXISTS users (
@@ -19,90 +285,204 @@ class AuthManager:
                     balance REAL NOT NULL
                 )
             """)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    token_hash TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID
+            """)
+            # Для sweep() по сроку и для отзыва всех сессий пользователя
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id)")
 
     def register_user(self, username, password, country, balance):
-        """Регистрация нового пользователя с уязвимостью SQL-инъекции"""
+        """Регистрация нового пользователя"""
+        password_hash = self.executor.submit(self.hasher.hash, password).result()
         with self.connection:
-            # УЯЗВИМОСТЬ: использование форматирования строк делает возможной SQL-инъекцию
-            # Злоумышленник может ввести специальные символы для выполнения произвольного SQL-кода
-            self.connection.execute("""
-                INSERT INTO users (username, password, country, balance)
-                VALUES ('{}', '{}', '{}', {})
-            """.format(username, password, country, balance))
+            self.connection.execute(QUERIES["insert_user"], (username, password_hash, country, balance))
+
+    def register_users(self, users, chunk_size=REGISTER_CHUNK_SIZE):
+        """Регистрация потока пользователей (username, password, country, balance)
+
+        Пользователи добавляются через executemany, по chunk_size в одной
+        транзакции, и не накапливаются в памяти целиком. Строки, нарушившие
+        ограничения (например, повторное имя), не прерывают загрузку: если
+        пачка не прошла, она откатывается и повторяется построчно, а
+        отклоненные строки попадают в failures. Пароли пачки хешируются
+        параллельно в пуле executor.
+        """
+        users = iter(users)
+        inserted, failures, start = 0, [], 0
+        while chunk := list(islice(users, chunk_size)):
+            passwords = [user[1] for user in chunk]
+            step = -(-len(passwords) // (os.cpu_count() or 1))
+            parts = [passwords[i:i + step] for i in range(0, len(passwords), step)]
+            hashed = self.executor.map(hash_passwords, [self.hasher] * len(parts), parts)
+            hashes = [password_hash for part in hashed for password_hash in part]
+            chunk = [(user[0], password_hash, *user[2:]) for user, password_hash in zip(chunk, hashes)]
+            try:
+                with self.connection:
+                    self.connection.executemany(QUERIES["insert_user"], chunk)
+                inserted += len(chunk)
+            except sqlite3.IntegrityError:
+                with self.connection:
+                    for index, user in enumerate(chunk, start):
+                        try:
+                            self.connection.execute(QUERIES["insert_user"], user)
+                            inserted += 1
+                        except sqlite3.IntegrityError as e:
+                            failures.append((index, user[0], str(e)))
+            start += len(chunk)
+        return RegistrationResult(inserted, failures)
 
     def authenticate_user(self, username, password):
-        """Аутентификация пользователя с уязвимостью SQL-инъекции"""
-        cursor = self.connection.cursor()
-        # УЯЗВИМОСТЬ: параметры напрямую подставляются в SQL-запрос
-        # Пример инъекции: username = "admin' --" обойдет проверку пароля
-        cursor.execute("""
-            SELECT * FROM users
-            WHERE username = '{}' AND password = '{}'
-        """.format(username, password))
-        return cursor.fetchone()
+        """Аутентификация пользователя: строка пользователя или None
+
+        Пароль проверяется в пуле executor. Хеш, полученный с другими
+        настройками KDF, после успешного входа пересчитывается с текущими.
+        Для неизвестного имени проверяется фиктивный хеш, чтобы время
+        ответа не выдавало, есть ли такой пользователь.
+        """
+        user = self.connection.execute(QUERIES["user_by_name"], (username,)).fetchone()
+        if user is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hasher.hash(os.urandom(SALT_BYTES).hex())
+            self.executor.submit(self.hasher.verify, password, self._dummy_hash).result()
+            return None
+        stored = user[2]
+        if not self.executor.submit(self.hasher.verify, password, stored).result():
+            return None
+        if self.hasher.needs_rehash(stored):
+            password_hash = self.executor.submit(self.hasher.hash, password).result()
+            with self.connection:
+                self.connection.execute(QUERIES["rehash_password"], (password_hash, user[0], stored))
+            user = self.connection.execute(QUERIES["user_by_id"], (user[0],)).fetchone()
+        return user
+
+    def login(self, username, password):
+        """Вход по паролю: токен сессии или None
+
+        Последующие действия проверяют токен через validate_session(),
+        без запроса пользователя и проверки пароля.
+        """
+        user = self.authenticate_user(username, password)
+        return None if user is None else self.sessions.issue(user[0])
+
+    def validate_session(self, token):
+        """ID пользователя сессии или None"""
+        return self.sessions.validate(token)
+
+    def logout(self, token):
+        self.sessions.revoke(token)
+
+    def sweep_sessions(self):
+        """Удаление истекших сессий; возвращает их число"""
+        return self.sessions.sweep()
 
     def delete_user(self, user_id):
-        """Удаление пользователя с уязвимостью SQL-инъекции"""
+        """Удаление пользователя вместе со всеми его сессиями"""
+        # Сначала сессии: если удаление пользователя не пройдет, останется
+        # только выход из системы, а не сессии удаленного пользователя
+        self.sessions.revoke_user(user_id)
         with self.connection:
-            # УЯЗВИМОСТЬ: числовые параметры также уязвимы для инъекций
-            self.connection.execute("""
-                DELETE FROM users WHERE id = {}
-            """.format(user_id))
+            self.connection.execute(QUERIES["delete_user"], (user_id,))
 
     def get_user_by_id(self, user_id):
-        """Получение пользователя по ID с уязвимостью SQL-инъекции"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT * FROM users WHERE id = {}
-        """.format(user_id))
-        return cursor.fetchone()
+        """Получение пользователя по ID"""
+        return self.connection.execute(QUERIES["user_by_id"], (user_id,)).fetchone()
 
     def count_users_by_country(self, country):
-        """Подсчет пользователей по стране с уязвимостью SQL-инъекции"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM users WHERE country = '{}'
-        """.format(country))
-        return cursor.fetchone()[0]
+        """Подсчет пользователей по стране"""
+        return self.connection.execute(QUERIES["count_by_country"], (country,)).fetchone()[0]
+
+    @contextmanager
+    def immediate_transaction(self):
+        """Транзакция BEGIN IMMEDIATE: блокировка записи берется сразу
+
+        Параллельные переводы ждут друг друга на BEGIN (в пределах
+        timeout соединения), а не получают SQLITE_BUSY посреди
+        транзакции, как при отложенном BEGIN с чтением перед записью.
+        Соединение не должно использоваться несколькими потоками сразу.
+        """
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.rollback()
+            raise
+        self.connection.commit()
+
+    def _transfer(self, from_user_id, to_user_id, amount):
+        """Перевод внутри открытой транзакции; возвращает текст ошибки или None"""
+        if not amount > 0:
+            return "Amount must be positive"
+        if self.connection.execute(QUERIES["withdraw"], (amount, from_user_id, amount)).rowcount != 1:
+            if self.connection.execute(QUERIES["user_by_id"], (from_user_id,)).fetchone() is None:
+                return f"User {from_user_id} not found"
+            return "Insufficient funds"
+        if self.connection.execute(QUERIES["deposit"], (amount, to_user_id)).rowcount != 1:
+            # Получателя нет: возвращаем списанное
+            self.connection.execute(QUERIES["deposit"], (amount, from_user_id))
+            return f"User {to_user_id} not found"
+        return None
 
     def transfer_balance(self, from_user_id, to_user_id, amount):
-        """Перевод средств между пользователями с уязвимостью SQL-инъекции"""
-        with self.connection:
-            # УЯЗВИМОСТЬ: все параметры уязвимы для инъекций
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT balance FROM users WHERE id = {}".format(from_user_id))
-            from_balance = cursor.fetchone()[0]
+        """Перевод средств между пользователями: ValueError, если он невозможен"""
+        with self.immediate_transaction():
+            error = self._transfer(from_user_id, to_user_id, amount)
+        if error:
+            raise ValueError(error)
+
+    def transfer_many(self, transfers):
+        """Проведение переводов (from_user_id, to_user_id, amount) в одной транзакции
+
+        Каждый перевод проверяется отдельно: невозможные пропускаются и
+        попадают в failures, остальные фиксируются одним COMMIT.
+        """
+        applied, failures = 0, []
+        with self.immediate_transaction():
+            for index, (from_user_id, to_user_id, amount) in enumerate(transfers):
+                error = self._transfer(from_user_id, to_user_id, amount)
+                if error:
+                    failures.append((index, error))
+                else:
+                    applied += 1
+        return TransferResult(applied, failures)
 
-            if from_balance < amount:
-                raise ValueError("Insufficient funds")
 
-            # УЯЗВИМОСТЬ: злоумышленник может изменить сумму перевода или ID пользователей
-            self.connection.execute("""
-                UPDATE users SET balance = balance - {} WHERE id = {}
-            """.format(amount, from_user_id))
-            self.connection.execute("""
-                UPDATE users SET balance = balance + {} WHERE id = {}
-            """.format(amount, to_user_id))
+# ФИКСТУРЫ PYTEST - подготовка тестового окружения
 
+# Дешевые параметры KDF, чтобы тесты не тратили время на хеширование
+TEST_HASHER = PasswordHasher("scrypt", n=2 ** 4, r=1, p=1)
 
-# ФИКСТУРЫ PYTEST - подготовка тестового окружения
 @pytest.fixture
 def db():
     """Фикстура: создание временной базы данных в памяти"""
-    connection = sqlite3.connect(":memory:")
+    connection = connect(":memory:")
     yield connection  # Возвращаем соединение тесту
     connection.close()  # Закрываем соединение после теста
 
 @pytest.fixture
 def auth_manager(db):
     """Фикстура: создание менеджера аутентификации с подключением к БД"""
-    return AuthManager(db)
+    return AuthManager(db, hasher=TEST_HASHER)
+
+@pytest.fixture
+def query_log(monkeypatch):
+    """Фикстура: журнал SQL-запросов (sqltrace.py из Lab_5), порог 0 - в журнал попадает всё.
+
+    Путь к Lab_5 добавляется только на время теста; без sqltrace тест пропускается.
+    """
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Lab_5"))
+    sqltrace = pytest.importorskip("sqltrace")
+    return sqltrace.QueryLog(threshold=0.0, top_n=50)
 
 
 # ТЕСТОВЫЕ ФУНКЦИИ
 def test_sql_injection_register_user(auth_manager, db):
     """
-    Тест демонстрирует уязвимость SQL-инъекции при регистрации пользователя.
+    Тест проверяет защиту от SQL-инъекции при регистрации пользователя.
     Злоумышленник может попытаться удалить таблицу через имя пользователя.
     """
     # Попытка SQL-инъекции: в имени пользователя содержится команда DROP TABLE
@@ -114,17 +494,24 @@ def test_sql_injection_register_user(auth_manager, db):
     tables = cursor.fetchall()
     assert len(tables) == 1  # Таблица должна сохраниться
 
+    # Имя сохранено как обычные данные
+    cursor.execute("SELECT username FROM users")
+    assert cursor.fetchall() == [("testuser'; DROP TABLE users; --",)]
+
 def test_sql_injection_authenticate_user(auth_manager):
     """
-    Тест демонстрирует уязвимость SQL-инъекции при аутентификации.
-    Злоумышленник может обойти проверку пароля.
+    Тест проверяет защиту от SQL-инъекции при аутентификации.
+    Злоумышленник может попытаться обойти проверку пароля.
     """
     # Сначала регистрируем нормального пользователя
     auth_manager.register_user("testuser", "password123", "Country", 1000)
 
     # Попытка SQL-инъекции: обход проверки пароля с помощью 'OR '1'='1
     user = auth_manager.authenticate_user("testuser' OR '1'='1", "any_password")
-    assert user is not None  # Инъекция успешна - пользователь найден без правильного пароля
+    assert user is None  # Инъекция не сработала - такого имени пользователя нет
+
+    user = auth_manager.authenticate_user("testuser", "password123")
+    assert user[1] == "testuser"
 
 def test_count_users_by_country(auth_manager):
     """
@@ -142,7 +529,6 @@ def test_count_users_by_country(auth_manager):
 def test_transfer_balance(auth_manager, db):
     """
     Тест проверяет функциональность перевода средств.
-    Демонстрирует уязвимость в финансовых операциях.
     """
     # Создаем двух пользователей с разными балансами
     auth_manager.register_user("user1", "password123", "CountryA", 1000)
@@ -162,6 +548,224 @@ def test_transfer_balance(auth_manager, db):
     assert balance2 == 700  # 500 + 200 = 700
 
 
+def test_passwords_are_hashed(db):
+    """
+    Тест проверяет, что пароль хранится как хеш с алгоритмом и параметрами,
+    а вход проходит только с верным паролем.
+    """
+    auth_manager = AuthManager(db)
+    auth_manager.register_user("user1", "password123", "CountryA", 1000)
+    stored = db.execute("SELECT password FROM users").fetchone()[0]
+    assert stored.startswith("scrypt$n=32768,r=8,p=1$")
+    assert "password123" not in stored
+
+    assert auth_manager.authenticate_user("user1", "password123")[1] == "user1"
+    assert auth_manager.authenticate_user("user1", "password") is None
+    assert auth_manager.authenticate_user("nobody", "password123") is None
+
+
+def test_rehash_on_login(db):
+    """
+    Тест проверяет пересчет хеша при входе: старые параметры KDF и пароли
+    в открытом виде заменяются хешем с текущими настройками.
+    """
+    AuthManager(db, hasher=PasswordHasher("pbkdf2_sha256", i=1000)).register_user(
+        "user1", "password123", "CountryA", 1000)
+    with db:
+        db.execute(QUERIES["insert_user"], ("user2", "plain-password", "CountryA", 1000))
+
+    auth_manager = AuthManager(db, hasher=TEST_HASHER)
+    assert auth_manager.authenticate_user("user2", "wrong-password") is None
+    assert auth_manager.get_user_by_id(2)[2] == "plain-password"
+
+    for user_id, username, password in [(1, "user1", "password123"), (2, "user2", "plain-password")]:
+        user = auth_manager.authenticate_user(username, password)
+        assert user[2].startswith("scrypt$n=16,r=1,p=1$")
+        assert not TEST_HASHER.needs_rehash(auth_manager.get_user_by_id(user_id)[2])
+        assert auth_manager.authenticate_user(username, password) == user
+
+
+def test_sessions(auth_manager, db):
+    """
+    Тест проверяет сессии: вход выдает токен, горячий токен проверяется
+    без запросов к базе, выход и удаление пользователя его отзывают.
+    """
+    auth_manager.register_user("user1", "password123", "CountryA", 1000)
+    auth_manager.register_user("user2", "password123", "CountryB", 500)
+
+    assert auth_manager.login("user1", "wrong-password") is None
+    token, other = auth_manager.login("user1", "password123"), auth_manager.login("user2", "password123")
+    # В таблице только хеш токена
+    assert db.execute(QUERIES["session"], (token_key(token),)).fetchone()[0] == 1
+
+    statements = []
+    db.set_trace_callback(statements.append)
+    assert all(auth_manager.validate_session(token) == 1 for _ in range(100))
+    assert statements == []  # горячий токен проверяется без базы
+    db.set_trace_callback(None)
+    assert auth_manager.validate_session("forged-token") is None
+
+    # Новое хранилище на той же базе находит сессию в таблице
+    assert AuthManager(db, hasher=TEST_HASHER).validate_session(other) == 2
+
+    auth_manager.delete_user(1)
+    assert auth_manager.validate_session(token) is None
+    auth_manager.logout(other)
+    assert auth_manager.validate_session(other) is None
+    assert db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 0
+
+
+def test_session_expiry_and_sweep(db):
+    """
+    Тест проверяет срок жизни сессий, перечитывание кэша и массовую
+    очистку истекших сессий.
+    """
+    now = [1000.0]
+    sessions = SessionStore(db, ttl=100, max_size=2, cache_ttl=10, clock=lambda: now[0])
+    auth_manager = AuthManager(db, hasher=TEST_HASHER, sessions=sessions)
+    auth_manager.register_user("user1", "password123", "CountryA", 1000)
+    tokens = [auth_manager.login("user1", "password123") for _ in range(3)]
+    assert len(sessions._cache) == 2  # самый старый токен вытеснен из кэша
+    assert [auth_manager.validate_session(token) for token in reversed(tokens)] == [1, 1, 1]
+    assert (sessions.hits, sessions.misses) == (2, 1)
+
+    # Отзыв мимо этого хранилища виден после cache_ttl
+    with db:
+        db.execute("DELETE FROM sessions WHERE token_hash = ?", (token_key(tokens[0]),))
+    assert auth_manager.validate_session(tokens[0]) == 1
+    now[0] += 11
+    assert auth_manager.validate_session(tokens[0]) is None
+
+    fresh = auth_manager.login("user1", "password123")
+    now[0] += 95  # первые токены истекли, fresh еще нет
+    assert auth_manager.validate_session(tokens[0]) is None
+    assert auth_manager.sweep_sessions() == 2
+    assert auth_manager.validate_session(fresh) == 1
+    assert db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 1
+
+
+def test_transfer_balance_errors(auth_manager):
+    """
+    Тест проверяет, что невозможный перевод не меняет ни одного баланса.
+    """
+    auth_manager.register_user("user1", "password123", "CountryA", 100)
+    auth_manager.register_user("user2", "password123", "CountryB", 0)
+
+    for to_user_id, amount, message in [(2, 150, "Insufficient funds"), (3, 50, "User 3 not found"),
+                                        (2, -50, "Amount must be positive")]:
+        with pytest.raises(ValueError, match=message):
+            auth_manager.transfer_balance(1, to_user_id, amount)
+    with pytest.raises(ValueError, match="User 7 not found"):
+        auth_manager.transfer_balance(7, 1, 10)
+    assert auth_manager.get_user_by_id(1)[4] == 100
+    assert auth_manager.get_user_by_id(2)[4] == 0
+
+
+def test_transfer_many(auth_manager):
+    """
+    Тест проверяет пакет переводов: невозможные пропускаются, остальные
+    проводятся по порядку в одной транзакции.
+    """
+    auth_manager.register_user("user1", "password123", "CountryA", 100)
+    auth_manager.register_user("user2", "password123", "CountryB", 0)
+
+    # Второй перевод возможен только после первого
+    result = auth_manager.transfer_many([(1, 2, 80), (2, 1, 30), (1, 2, 100), (2, 9, 10)])
+    assert result == (2, [(2, "Insufficient funds"), (3, "User 9 not found")])
+    assert auth_manager.get_user_by_id(1)[4] == 50
+    assert auth_manager.get_user_by_id(2)[4] == 50
+
+
+def test_concurrent_transfers_conserve_balance(tmp_path):
+    """
+    Стресс-тест: потоки со своими соединениями одновременно переводят
+    средства между одними и теми же пользователями. Сумма балансов не
+    меняется, и ни один баланс не уходит в минус.
+    """
+    path = str(tmp_path / "bank.db")
+    users = 10
+    setup = AuthManager(connect(path), hasher=TEST_HASHER)
+    setup.register_users((f"user{i}", "password123", "CountryA", 100) for i in range(users))
+    setup.connection.close()
+
+    errors = []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        manager = AuthManager(connect(path), hasher=TEST_HASHER)
+        try:
+            for step in range(200):
+                from_user_id, to_user_id = rng.sample(range(1, users + 1), 2)
+                if step % 20 == 0:
+                    manager.transfer_many([(rng.randint(1, users), rng.randint(1, users), rng.randint(1, 30))
+                                           for _ in range(50)])
+                    continue
+                try:
+                    manager.transfer_balance(from_user_id, to_user_id, rng.randint(1, 60))
+                except ValueError as e:
+                    assert str(e) == "Insufficient funds"
+        except Exception as e:
+            errors.append(e)
+        finally:
+            manager.connection.close()
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    connection = connect(path)
+    total, lowest = connection.execute("SELECT SUM(balance), MIN(balance) FROM users").fetchone()
+    connection.close()
+    assert total == users * 100
+    assert lowest >= 0
+
+
+def test_register_users(auth_manager, db):
+    """
+    Тест проверяет пакетную регистрацию: повторные имена отклоняются
+    построчно, остальные пользователи всех пачек добавляются.
+    """
+    auth_manager.register_user("user1", "password123", "CountryA", 1000)
+    users = [(f"user{i}", "password123", "CountryB", 500) for i in range(2, 9)]
+    users[3] = ("user1", "password123", "CountryB", 500)  # уже есть в базе
+    users[5] = ("user2", "password123", "CountryB", 500)  # повтор внутри пакета
+
+    result = auth_manager.register_users(iter(users), chunk_size=3)
+    assert result.inserted == 5
+    assert [(index, username) for index, username, _ in result.failures] == [(3, "user1"), (5, "user2")]
+    assert "UNIQUE" in result.failures[0][2]
+
+    cursor = db.cursor()
+    cursor.execute("SELECT username FROM users ORDER BY id")
+    assert [row[0] for row in cursor.fetchall()] == ["user1", "user2", "user3", "user4", "user6", "user8"]
+    assert auth_manager.count_users_by_country("CountryB") == 5
+
+
+def test_query_log_traces_auth_manager(query_log):
+    """
+    Тест проверяет трассировку запросов AuthManager: каждое выражение
+    попадает в статистику, медленные - в журнал с планом и местом вызова.
+    """
+    connection = query_log.connect(":memory:")
+    auth_manager = AuthManager(connection, hasher=TEST_HASHER)
+    auth_manager.register_user("user1", "password123", "CountryA", 1000)
+    auth_manager.register_user("user2", "password123", "CountryB", 500)
+    auth_manager.transfer_balance(1, 2, 200)
+    assert auth_manager.count_users_by_country("CountryA") == 1
+
+    statements = {entry["sql"]: entry for entry in query_log.top(50)}
+    assert statements[QUERIES["count_by_country"]]["calls"] == 1
+    # Один текст запроса на все регистрации - один разбор в кэше выражений
+    assert statements[QUERIES["insert_user"]]["calls"] == 2
+    slow = [entry for entry in query_log.slow_queries() if entry["sql"] == QUERIES["withdraw"]]
+    assert slow[0]["caller"].endswith("in _transfer")
+    assert any("USING INTEGER PRIMARY KEY" in step for step in slow[0]["plan"])
+    connection.close()
+
+
 # ИНТЕРАКТИВНЫЙ ИНТЕРФЕЙС ДЛЯ ВЫБОРА ТЕСТОВ
 def show_menu():
     """Отображение меню выбора тестов"""
@@ -169,8 +773,8 @@ def show_menu():
     print("ВЫБОР ТЕСТОВ ДЛЯ ЗАПУСКА")
     print("=" * 50)
     print("1. Все тесты - запуск всех тестовых сценариев")
-    print("2. SQL-инъекция при регистрации - тест уязвимости в методе register_user")
-    print("3. SQL-инъекция при аутентификации - тест уязвимости в методе authenticate_user")
+    print("2. SQL-инъекция при регистрации - тест защиты метода register_user")
+    print("3. SQL-инъекция при аутентификации - тест защиты метода authenticate_user")
     print("4. Подсчет пользователей по стране - тест функциональности подсчета")
     print("5. Перевод средств - тест финансовых операций")
     print("6. Выход - завершение программы")
@@ -224,7 +828,7 @@ if __name__ == "__main__":
     else:
         # Интерактивный режим с меню выбора
         print("Демонстрация SQL-инъекций в системе аутентификации")
-        print("Класс AuthManager содержит уязвимости в каждом методе!")
+        print("Запросы AuthManager параметризованы: введенные данные не меняют SQL")
 
         while True:
             show_menu()
@@ -0,0 +1,77 @@
+"""Listing latency of the items table before and after the created_at index.
+
+Builds a synthetic catalog for every size, then times the first page and a
+deep keyset page of GET /items/ at schema version 1 (no index) and at the
+latest version.
+
+    python bench_listing.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from migrations import MIGRATIONS, migrate
+
+PAGE_SIZE = 50
+# Same statements get_items runs for the first page and for a keyset page
+FIRST_PAGE = 'SELECT * FROM items ORDER BY created_at DESC, id DESC LIMIT ?'
+NEXT_PAGE = ('SELECT * FROM items WHERE (created_at, id) < (?, ?) '
+             'ORDER BY created_at DESC, id DESC LIMIT ?')
+
+
+def build_catalog(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    migrate(conn, MIGRATIONS[:1])
+    start = time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1))
+    rng = random.Random(rows)
+    with conn:
+        conn.executemany(
+            'INSERT INTO items (name, description, price, created_at) VALUES (?, ?, ?, ?)',
+            ((f"Lot {i}", "Synthetic lot", round(rng.uniform(1, 10000), 2),
+              time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + rng.randrange(365 * 86400))))
+             for i in range(rows)),
+        )
+    return conn
+
+
+def time_query(conn: sqlite3.Connection, sql: str, params, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def run(sizes, repeat: int):
+    print(f"{'rows':>9} {'schema':>7} {'first page ms':>14} {'deep page ms':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            path = os.path.join(tmp, f"items_{rows}.db")
+            conn = build_catalog(path, rows)
+            # Cursor pointing at the middle of the table
+            created_at, item_id = conn.execute(
+                'SELECT created_at, id FROM items ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?',
+                (rows // 2,)).fetchone()
+            first = (FIRST_PAGE, (PAGE_SIZE,))
+            deep = (NEXT_PAGE, (created_at, item_id, PAGE_SIZE))
+
+            for label in ("v1", "latest"):
+                if label == "latest":
+                    migrate(conn)
+                    conn.execute('ANALYZE')
+                print(f"{rows:>9} {label:>7} {time_query(conn, *first, repeat):>14.3f} "
+                      f"{time_query(conn, *deep, repeat):>13.3f}")
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
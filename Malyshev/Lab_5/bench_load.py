@@ -0,0 +1,246 @@
+"""Load test: mixed read/write workload against the auction API.
+
+Seeds a synthetic catalog through POST /items/bulk, then runs workers
+that each send requests back to back, picking the route from a weighted
+mix: create_item, get_items, get_item, update_item, delete_item, search
+and stats. Without --url the app runs in-process over the ASGI transport
+(with its lifespan, on a temporary database); with --url it targets a
+running server, e.g. `uvicorn server:app --workers 4`.
+
+Prints throughput and p50/p95/p99 latency per route, saves the run as
+JSON with --output and, given a --baseline from an earlier run, exits
+with status 1 when throughput or p95 latency is worse by more than
+--threshold.
+
+    python bench_load.py --items 10000 --requests 20000 --concurrency 32 \\
+        --output run.json --baseline previous.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+ROUTES = ["create", "list", "get", "update", "delete", "search", "stats"]
+DEFAULT_MIX = "get=50,list=20,search=10,stats=5,create=8,update=5,delete=2"
+WORDS = ["vintage", "antique", "rare", "golden", "silver", "wooden", "signed", "watch",
+         "clock", "chair", "painting", "vase", "coin", "stamp", "guitar", "camera", "lamp"]
+SEED_CHUNK = 5000
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        route, _, weight = part.partition("=")
+        if route.strip() not in ROUTES:
+            raise argparse.ArgumentTypeError(f"unknown route {route!r}, expected one of {ROUTES}")
+        mix[route.strip()] = float(weight or 1)
+    return mix
+
+
+def synthetic_item(rng: random.Random) -> dict:
+    return {"name": f"{rng.choice(WORDS)} {rng.choice(WORDS)}",
+            "description": " ".join(rng.choice(WORDS) for _ in range(12)),
+            "price": round(rng.uniform(1, 10000), 2)}
+
+
+@asynccontextmanager
+async def open_client(url, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if url:
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+            yield client
+        return
+    # In-process: a fresh database, and the lifespan the ASGI transport does not run
+    os.environ.setdefault("AUCTION_DB", os.path.join(tempfile.mkdtemp(), "auction.db"))
+    import server
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            yield client
+
+
+async def seed(client: httpx.AsyncClient, items: int, rng: random.Random) -> list:
+    if items == 0:
+        # Reuse the catalog already on the server
+        response = await client.get("/items/", params={"fields": "id"})
+        response.raise_for_status()
+        return [item["id"] for item in response.json()]
+    ids = []
+    for start in range(0, items, SEED_CHUNK):
+        rows = [synthetic_item(rng) for _ in range(min(SEED_CHUNK, items - start))]
+        response = await client.post("/items/bulk", content="\n".join(map(json.dumps, rows)),
+                                     headers={"Content-Type": "application/x-ndjson"})
+        response.raise_for_status()
+        ids += response.json()["ids"]
+    return ids
+
+
+class Workload:
+    """Shared state of the workers: live ids, request budget and samples."""
+
+    def __init__(self, ids: list, requests: int, mix: dict, page_size: int, seed: int):
+        self.ids = ids
+        self.remaining = requests
+        self.routes = list(mix)
+        self.weights = list(mix.values())
+        self.page_size = page_size
+        self.rng = random.Random(seed)
+        self.samples = {route: [] for route in self.routes}
+        self.errors = {route: 0 for route in self.routes}
+
+    def next_route(self):
+        if self.remaining <= 0:
+            return None
+        self.remaining -= 1
+        return self.rng.choices(self.routes, self.weights)[0]
+
+    async def send(self, client: httpx.AsyncClient, route: str) -> bool:
+        rng = self.rng
+        item_id = rng.choice(self.ids) if self.ids else 0
+        if route == "create":
+            response = await client.post("/items/", json=synthetic_item(rng))
+            if response.status_code == 201:
+                self.ids.append(response.json()["id"])
+        elif route == "list":
+            response = await client.get("/items/", params={"limit": self.page_size})
+        elif route == "get":
+            response = await client.get(f"/items/{item_id}")
+        elif route == "update":
+            response = await client.put(f"/items/{item_id}", json=synthetic_item(rng))
+        elif route == "delete":
+            if self.ids:
+                self.ids.remove(item_id)
+            response = await client.delete(f"/items/{item_id}")
+        elif route == "search":
+            response = await client.get("/items/search", params={"q": rng.choice(WORDS), "limit": 20})
+        else:
+            response = await client.get("/items/stats")
+        # Another worker may have deleted the item in the meantime
+        return response.status_code < 400 or response.status_code == 404
+
+    async def worker(self, client: httpx.AsyncClient):
+        while (route := self.next_route()) is not None:
+            started = time.perf_counter()
+            try:
+                ok = await self.send(client, route)
+            except httpx.HTTPError:
+                ok = False
+            self.samples[route].append(time.perf_counter() - started)
+            if not ok:
+                self.errors[route] += 1
+
+
+def percentile(sorted_samples: list, fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples: list, errors: int, elapsed: float) -> dict:
+    samples = sorted(samples)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    async with open_client(args.url, args.concurrency) as client:
+        started = time.perf_counter()
+        ids = await seed(client, args.items, rng)
+        seeded_in = time.perf_counter() - started
+
+        workload = Workload(ids, args.requests, args.mix, args.page_size, args.seed)
+        started = time.perf_counter()
+        await asyncio.gather(*(workload.worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    routes = {route: summarize(workload.samples[route], workload.errors[route], elapsed)
+              for route in workload.routes}
+    all_samples = [sample for samples in workload.samples.values() for sample in samples]
+    return {
+        "config": {"url": args.url or "asgi", "items": args.items, "requests": args.requests,
+                   "concurrency": args.concurrency, "mix": args.mix, "page_size": args.page_size,
+                   "seed": args.seed, "backend": os.environ.get("AUCTION_DB_BACKEND", "sync")},
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                        "machine": platform.machine()},
+        "seed_seconds": round(seeded_in, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "total": summarize(all_samples, sum(workload.errors.values()), elapsed),
+        "routes": routes,
+    }
+
+
+def print_report(result: dict):
+    print(f"seeded {result['config']['items']} items in {result['seed_seconds']:.1f}s, "
+          f"{result['config']['requests']} requests at concurrency {result['config']['concurrency']} "
+          f"in {result['elapsed_seconds']:.1f}s")
+    print(f"{'route':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, stats in [*result["routes"].items(), ("total", result["total"])]:
+        print(f"{route:>8} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput']:>9.1f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+
+
+# Throughput may not drop, and p95 latency may not grow, by more than threshold
+def regressions(result: dict, baseline: dict, threshold: float) -> list:
+    found = []
+    for route, stats in [("total", result["total"]), *result["routes"].items()]:
+        before = baseline["total"] if route == "total" else baseline["routes"].get(route)
+        if not before or not before["requests"] or not stats["requests"]:
+            continue
+        if stats["throughput"] < before["throughput"] * (1 - threshold):
+            found.append(f"{route}: throughput {before['throughput']} -> {stats['throughput']} req/s")
+        if stats["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            found.append(f"{route}: p95 {before['p95_ms']} -> {stats['p95_ms']} ms")
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running server; in-process ASGI if omitted")
+    parser.add_argument("--items", type=int, default=10000,
+                        help="synthetic catalog size, 0 to use the items already stored")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"route weights (default {DEFAULT_MIX})")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed relative regression against the baseline")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(result, json.load(f), args.threshold)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
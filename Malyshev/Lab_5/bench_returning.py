@@ -0,0 +1,57 @@
+"""Per-write latency of INSERT/UPDATE ... RETURNING against write + SELECT.
+
+Runs insert_item_row and update_item_row from server.py on a
+connection with the WAL profile, once with RETURNING and once with the
+fallback that reads the row back, each write in its own transaction.
+
+    python bench_returning.py --writes 20000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+TMP = tempfile.mkdtemp()
+os.environ["AUCTION_DB"] = os.path.join(TMP, "auction.db")
+
+import server
+from db import connect, connection_pragmas
+
+
+def time_writes(conn, fn, args_for, writes: int):
+    samples = []
+    for i in range(writes):
+        args = args_for(i)
+        started = time.perf_counter()
+        with conn:
+            fn(conn, *args)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1e6, statistics.mean(samples) * 1e6
+
+
+def run(writes: int):
+    server.init_db()
+    conn = connect(server.DATABASE, connection_pragmas(server.STORAGE_PROFILE))
+    item = server.ItemCreate(name="Lot", description="Synthetic lot", price=10)
+    supported = server.HAS_RETURNING
+    modes = [("RETURNING", True), ("write+SELECT", False)] if supported else [("write+SELECT", False)]
+
+    print(f"SQLite {server.sqlite3.sqlite_version}, {writes} writes per case")
+    print(f"{'case':>22} {'median us':>10} {'mean us':>10}")
+    for label, returning in modes:
+        server.HAS_RETURNING = returning
+        first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM items").fetchone()[0]
+        median, mean = time_writes(conn, server.insert_item_row, lambda i: (item,), writes)
+        print(f"{'insert ' + label:>22} {median:>10.1f} {mean:>10.1f}")
+        median, mean = time_writes(conn, server.update_item_row,
+                                   lambda i: (first_id + i, item), writes)
+        print(f"{'update ' + label:>22} {median:>10.1f} {mean:>10.1f}")
+    server.HAS_RETURNING = supported
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=20000)
+    run(parser.parse_args().writes)
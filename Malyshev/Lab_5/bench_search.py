@@ -0,0 +1,85 @@
+"""Search latency: FTS5 index against a LIKE '%q%' scan.
+
+Builds a synthetic catalog at the latest schema version, indexed by the
+insert trigger like every other write, then times the ranked FTS query
+used by GET /items/search and the LIKE scan clients would need without it.
+Broad queries favour LIKE, which stops after the first page of hits,
+while FTS ranks every match; selective queries are where the index wins.
+
+    python bench_search.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from migrations import migrate
+
+PAGE_SIZE = 20
+ADJECTIVES = ["vintage", "antique", "rare", "golden", "silver", "wooden", "signed", "limited",
+              "classic", "modern", "handmade", "restored", "original", "mint", "boxed"]
+NOUNS = ["watch", "clock", "chair", "painting", "vase", "coin", "stamp", "guitar", "camera",
+         "lamp", "mirror", "table", "ring", "bracelet", "poster", "record", "book", "rug"]
+# Common words match a large share of the catalog; maker names match a few rows
+QUERIES = ["vintage watch", "guitar", "signed poster", "maker4242", "maker777 clock"]
+
+# Same query as server.SEARCH_SQL, without importing the app
+FTS_SQL = '''
+SELECT items.*, bm25(items_fts, 10.0, 1.0) AS rank,
+       snippet(items_fts, -1, '<mark>', '</mark>', '…', 12) AS snippet
+FROM items_fts JOIN items ON items.id = items_fts.rowid
+WHERE items_fts MATCH ? ORDER BY rank LIMIT ?
+'''
+LIKE_SQL = '''
+SELECT * FROM items
+WHERE (name || ' ' || COALESCE(description, '')) LIKE ? ORDER BY created_at DESC LIMIT ?
+'''
+
+
+def build_catalog(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    rng = random.Random(rows)
+    with conn:
+        conn.executemany(
+            'INSERT INTO items (name, description, price) VALUES (?, ?, ?)',
+            ((f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}",
+              " ".join(rng.choice(ADJECTIVES + NOUNS) for _ in range(8))
+              + f" by maker{rng.randrange(max(rows // 10, 1))}",
+              round(rng.uniform(1, 10000), 2))
+             for _ in range(rows)),
+        )
+    return conn
+
+
+def median_ms(conn, sql: str, params, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def run(rows: int, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        conn = build_catalog(os.path.join(tmp, "search.db"), rows)
+        print(f"built {rows} rows with FTS index in {time.perf_counter() - started:.1f}s")
+        print(f"{'query':>16} {'FTS5 ms':>9} {'LIKE ms':>9}")
+        for query in QUERIES:
+            fts = " ".join(f'"{word}"' for word in query.split()) + "*"
+            print(f"{query:>16} {median_ms(conn, FTS_SQL, (fts, PAGE_SIZE), repeat):>9.2f} "
+                  f"{median_ms(conn, LIKE_SQL, (f'%{query}%', PAGE_SIZE), repeat):>9.2f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
@@ -0,0 +1,94 @@
+"""Throughput against the number of pre-forked workers.
+
+For each worker count, starts serve.py on a fresh database and a free
+port, then runs --clients bench_load.py processes against it in
+parallel (one client process cannot saturate several workers) and sums
+their throughput. Scaling is bounded by the cores of the machine and by
+SQLite's single writer, so write-heavy mixes flatten out early.
+
+    python bench_workers.py --workers 1 2 4 8 --clients 4 --requests 20000
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_server(workers: int, database: str):
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", "0",
+         "--db", database, "--log-level", "warning"],
+        cwd=HERE, stderr=subprocess.PIPE, text=True)
+    url = re.search(r"http://[\d.]+:\d+", process.stderr.readline()).group(0)
+    for _ in range(200):
+        try:
+            urllib.request.urlopen(url + "/items/stats", timeout=1).close()
+            return process, url
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"serve.py with {workers} workers did not start")
+
+
+def run_clients(url: str, args, tmp: str) -> dict:
+    subprocess.run([sys.executable, "bench_load.py", "--url", url, "--items", str(args.items),
+                    "--requests", "0"], cwd=HERE, stdout=subprocess.DEVNULL, check=True)
+    outputs = [os.path.join(tmp, f"client-{i}.json") for i in range(args.clients)]
+    clients = [
+        subprocess.Popen([sys.executable, "bench_load.py", "--url", url, "--items", "0",
+                          "--requests", str(args.requests // args.clients),
+                          "--concurrency", str(args.concurrency), "--mix", args.mix,
+                          "--seed", str(i + 1), "--output", output],
+                         cwd=HERE, stdout=subprocess.DEVNULL)
+        for i, output in enumerate(outputs)
+    ]
+    for client in clients:
+        client.wait()
+    results = []
+    for output in outputs:
+        with open(output) as f:
+            results.append(json.load(f)["total"])
+    return {
+        "throughput": sum(result["throughput"] for result in results),
+        "p50_ms": max(result["p50_ms"] for result in results),
+        "p99_ms": max(result["p99_ms"] for result in results),
+        "errors": sum(result["errors"] for result in results),
+    }
+
+
+def run(args):
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes x {args.concurrency} connections, "
+          f"mix {args.mix}")
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            server, url = start_server(workers, os.path.join(tmp, "auction.db"))
+            try:
+                result = run_clients(url, args, tmp)
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait()
+                server.stderr.close()
+        baseline = baseline or result["throughput"]
+        print(f"{workers:>8} {result['throughput']:>10.1f} {result['throughput'] / baseline:>7.2f}x "
+              f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--mix", default="get=60,list=20,search=10,create=5,update=5")
+    run(parser.parse_args())
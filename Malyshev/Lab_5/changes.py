@@ -0,0 +1,121 @@
+import asyncio
+import secrets
+from collections import deque
+from typing import Optional, Union
+
+
+class Subscription:
+    def __init__(self, backlog: list, queue_size: int):
+        self.backlog = backlog
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+
+class ChangeFeed:
+    """In-process broadcaster of item changes as Server-Sent Events.
+
+    Every event gets a sequence number and is formatted once, then fanned
+    out to the bounded queue of each subscriber. The last ``history`` events
+    are kept so clients can resume from the last id they saw. A subscriber
+    whose queue is full is cut off with an ``overflow`` event instead of
+    slowing down the writers; it reconnects with Last-Event-ID and catches
+    up from the history. Must only be used from the event loop thread.
+
+    Event ids are ``<epoch>-<seq>``, where the epoch is drawn anew for
+    every feed. An id from before a restart, or from another process, does
+    not match it, and neither does a sequence number the feed has not
+    reached; such clients get a ``reset`` event instead of a silent gap.
+    """
+
+    def __init__(self, history: int = 1000, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.epoch = secrets.token_hex(4)
+        self._seq = 0
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def publish(self, kind: str, data: str) -> int:
+        """Publish an event whose payload ``data`` is already JSON text."""
+        self._seq += 1
+        message = f"id: {self.event_id(self._seq)}\nevent: {kind}\ndata: {data}\n\n"
+        self._history.append((self._seq, message))
+        self.published += 1
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+        return self._seq
+
+    def _drop(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        subscription.overflowed = True
+        self.dropped += 1
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def parse_id(self, event_id: Union[int, str]) -> Optional[int]:
+        """Sequence number of an event id of this feed, or None if it is foreign.
+
+        A bare number is taken as a sequence number of the current epoch.
+        """
+        epoch, dash, seq = str(event_id).rpartition("-")
+        if (dash and epoch != self.epoch) or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        return int(seq)
+
+    def subscribe(self, since: Union[int, str, None] = None) -> Subscription:
+        seq = None if since is None else self.parse_id(since)
+        if since is None or seq == self._seq:
+            backlog = []
+        elif seq is not None and self._history and seq >= self._history[0][0] - 1:
+            backlog = [message for n, message in self._history if n > seq]
+        else:
+            # The client missed events that are no longer kept, or its id is
+            # from another epoch or ahead of this feed
+            backlog = [f"id: {self.event_id(self._seq)}\nevent: reset\n"
+                       f"data: {{\"seq\":{self._seq},\"epoch\":\"{self.epoch}\"}}\n\n"]
+        subscription = Subscription(backlog, self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    async def events(self, subscription: Subscription, keepalive: float = 15.0):
+        """Yield the SSE stream of a subscription until it overflows."""
+        try:
+            for message in subscription.backlog:
+                yield message
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    yield f"event: overflow\ndata: {{\"seq\":{self._seq}}}\n\n"
+                    break
+                yield message
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "epoch": self.epoch,
+            "seq": self._seq,
+            "subscribers": len(self._subscribers),
+            "history": len(self._history),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
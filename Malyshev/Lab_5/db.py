@@ -0,0 +1,461 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from queue import Empty, LifoQueue, SimpleQueue
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+if TYPE_CHECKING:
+    from sqltrace import QueryLog
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent initialisation relies on migrate() alone
+    fcntl = None
+
+# Storage profile for concurrent readers and a single writer. WAL lets readers
+# run while a write is in progress, and synchronous=NORMAL only fsyncs on
+# checkpoint, which is still crash-safe for the application in WAL mode.
+WAL_PROFILE = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16384,  # negative means KiB, i.e. a 16 MiB page cache
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+# PRAGMAs stored in the database file itself; they are set once by init_db()
+PERSISTENT_PRAGMAS = ("journal_mode",)
+
+
+def apply_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, object]):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def connection_pragmas(profile: Dict[str, object]) -> Dict[str, object]:
+    """Return the part of a storage profile that has to be set per connection."""
+    return {name: value for name, value in profile.items() if name not in PERSISTENT_PRAGMAS}
+
+
+def connect(database: str, pragmas: Optional[Dict[str, object]] = None,
+            read_only: bool = False, query_log: Optional["QueryLog"] = None) -> sqlite3.Connection:
+    """Open a connection that may be used from any thread.
+
+    With ``query_log`` every statement run on the connection is timed and
+    recorded in it.
+    """
+    factory = sqlite3.Connection
+    if query_log is not None:
+        # Only tracing needs sqltrace, keep it off the import path otherwise
+        from sqltrace import TracedConnection as factory
+    if read_only:
+        uri = Path(database).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=factory)
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn = sqlite3.connect(database, check_same_thread=False, factory=factory)
+    if query_log is not None:
+        query_log.attach(conn)
+    conn.row_factory = sqlite3.Row
+    apply_pragmas(conn, pragmas or {})
+    return conn
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive advisory lock on ``path`` across processes."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no connection becomes free within the acquire timeout."""
+
+
+class PoolClosed(sqlite3.ProgrammingError):
+    """Raised when a connection is requested from a closed pool."""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of sqlite3 connections.
+
+    Connections are opened lazily up to ``size``, initialised once with
+    ``pragmas`` and handed out LIFO so the hottest connection is reused.
+    Idle connections older than ``health_check_interval`` seconds are
+    pinged before being returned and replaced if the ping fails. With
+    ``read_only`` the connections are opened in ``mode=ro`` and refuse writes.
+    """
+
+    def __init__(self, database: str, size: int = 5, timeout: float = 30.0,
+                 pragmas: Optional[Dict[str, object]] = None,
+                 health_check_interval: float = 30.0, read_only: bool = False,
+                 query_log: Optional["QueryLog"] = None):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = dict(pragmas or {})
+        self.health_check_interval = health_check_interval
+        self.read_only = read_only
+        self.query_log = query_log
+
+        self._idle = LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+        # Wait time statistics, guarded by self._lock
+        self._acquired = 0
+        self._waited = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._replaced = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        return connect(self.database, self.pragmas, self.read_only, self.query_log)
+
+    @staticmethod
+    def _ping(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        if self._closed:
+            raise PoolClosed("Connection pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        blocked = False
+
+        while True:
+            try:
+                conn, released_at = self._idle.get_nowait()
+            except Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        conn = self._connect()
+                    except sqlite3.Error:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    break
+                remaining = timeout - (time.perf_counter() - started)
+                blocked = True
+                try:
+                    conn, released_at = self._idle.get(timeout=max(remaining, 0))
+                except Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {timeout:.1f}s"
+                    ) from None
+
+            if self._closed:
+                self._discard(conn)
+                raise PoolClosed("Connection pool is closed")
+            stale = time.monotonic() - released_at > self.health_check_interval
+            if stale and not self._ping(conn):
+                self._discard(conn)
+                with self._lock:
+                    self._replaced += 1
+                continue
+            break
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._acquired += 1
+            self._wait_total += waited
+            if waited > self._wait_max:
+                self._wait_max = waited
+            # Only acquires that had to wait for a release; opening a new
+            # connection is slow too but is not contention
+            if blocked:
+                self._waited += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+        if self._closed:
+            self._discard(conn)
+            return
+        self._idle.put_nowait((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def check(self) -> bool:
+        """Run a health check query on a pooled connection."""
+        try:
+            with self.connection() as conn:
+                return self._ping(conn)
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except Empty:
+                break
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            acquired = self._acquired
+            return {
+                "size": self.size,
+                "open": self._created,
+                "idle": self._idle.qsize(),
+                "in_use": self._created - self._idle.qsize(),
+                "acquired": acquired,
+                "waited": self._waited,
+                "timeouts": self._timeouts,
+                "replaced": self._replaced,
+                "wait_avg_ms": round(self._wait_total / acquired * 1000, 3) if acquired else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+class DBExecutor:
+    """Dedicated database threads fed from a queue, for use from asyncio.
+
+    Each worker thread owns one connection for its whole life, so jobs never
+    pay for a connect or a pool checkout. ``run()`` awaits a job without
+    blocking the event loop; jobs are callables taking the connection as
+    their first argument and each runs in its own transaction.
+    """
+
+    def __init__(self, database: str, workers: int = 1,
+                 pragmas: Optional[Dict[str, object]] = None, read_only: bool = False,
+                 query_log: Optional["QueryLog"] = None):
+        if workers < 1:
+            raise ValueError("Executor needs at least one worker")
+        self._queue = SimpleQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._completed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        # Connections are opened here so that a bad path fails the caller
+        connections = [connect(database, pragmas, read_only, query_log) for _ in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._work, args=(conn,), name=f"db-executor-{i}", daemon=True)
+            for i, conn in enumerate(connections)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _work(self, conn: sqlite3.Connection):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            future, fn, args, queued_at = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            waited = time.perf_counter() - queued_at
+            try:
+                with conn:
+                    result = fn(conn, *args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            with self._lock:
+                self._completed += 1
+                self._wait_total += waited
+                if waited > self._wait_max:
+                    self._wait_max = waited
+        conn.close()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if self._closed:
+            raise PoolClosed("Database executor is closed")
+        future = Future()
+        self._queue.put((future, fn, args, time.perf_counter()))
+        return future
+
+    async def run(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def close(self):
+        """Finish the queued jobs, then stop the workers and close connections."""
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self._completed
+            return {
+                "workers": len(self._threads),
+                "queued": self._queue.qsize(),
+                "completed": completed,
+                "wait_avg_ms": round(self._wait_total / completed * 1000, 3) if completed else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+class WriteBatcher:
+    """Single writer thread that group-commits queued write jobs.
+
+    The first queued job opens a batch; jobs arriving within ``max_linger``
+    seconds, up to ``max_batch_size``, join it. The batch runs in one
+    transaction with a savepoint per job, so a failing job is rolled back
+    alone and only its caller sees the error, while all other callers get
+    their results once the single COMMIT has succeeded.
+    """
+
+    def __init__(self, database: str, pragmas: Optional[Dict[str, object]] = None,
+                 max_batch_size: int = 64, max_linger: float = 0.002,
+                 query_log: Optional["QueryLog"] = None):
+        if max_batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        self.max_batch_size = max_batch_size
+        self.max_linger = max_linger
+        self._queue = SimpleQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._batches = 0
+        self._jobs = 0
+        self._failed = 0
+        self._max_batch = 0
+        self._commit_total = 0.0
+        self._wait_total = 0.0
+        self._conn = connect(database, pragmas, query_log=query_log)
+        self._thread = threading.Thread(target=self._work, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def _work(self):
+        stop = False
+        while not stop:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            deadline = time.perf_counter() + self.max_linger
+            while len(batch) < self.max_batch_size:
+                try:
+                    job = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+            self._run_batch(batch)
+        self._conn.close()
+
+    def _run_batch(self, batch):
+        conn = self._conn
+        batch = [job for job in batch if job[0].set_running_or_notify_cancel()]
+        started = time.perf_counter()
+        done = []
+        failed = 0
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for future, fn, args, _ in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    result = fn(conn, *args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    future.set_exception(e)
+                    failed += 1
+                else:
+                    conn.execute("RELEASE job")
+                    done.append((future, result))
+            conn.commit()
+        except BaseException as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+                    failed += 1
+            done = []
+        for future, result in done:
+            future.set_result(result)
+
+        finished = time.perf_counter()
+        with self._lock:
+            self._batches += 1
+            self._jobs += len(batch)
+            self._failed += failed
+            self._max_batch = max(self._max_batch, len(batch))
+            self._commit_total += finished - started
+            self._wait_total += sum(started - queued_at for _, _, _, queued_at in batch)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if self._closed:
+            raise PoolClosed("Write queue is closed")
+        future = Future()
+        self._queue.put((future, fn, args, time.perf_counter()))
+        return future
+
+    async def run(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def close(self):
+        """Flush the queued writes, then stop the writer thread."""
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            batches, jobs = self._batches, self._jobs
+            return {
+                "queued": self._queue.qsize(),
+                "batches": batches,
+                "jobs": jobs,
+                "failed": self._failed,
+                "batch_avg": round(jobs / batches, 2) if batches else 0.0,
+                "batch_max": self._max_batch,
+                "max_batch_size": self.max_batch_size,
+                "max_linger_ms": self.max_linger * 1000,
+                "wait_avg_ms": round(self._wait_total / jobs * 1000, 3) if jobs else 0.0,
+                "batch_avg_ms": round(self._commit_total / batches * 1000, 3) if batches else 0.0,
+            }
@@ -0,0 +1,239 @@
+import sqlite3
+from typing import Dict, List, NamedTuple, Optional
+
+from db import apply_pragmas, file_lock
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: List[str]
+
+
+# Recompute the summary tables from items with full scans. Used to fill them
+# in migration 6 and by POST /items/stats/rebuild to check for drift.
+REBUILD_ITEM_STATS = [
+    'DELETE FROM items_stats',
+    '''
+    INSERT INTO items_stats (id, item_count, price_sum, min_price, max_price)
+    SELECT 1, COUNT(*), TOTAL(price), MIN(price), MAX(price) FROM items
+    ''',
+    'DELETE FROM items_daily',
+    '''
+    INSERT INTO items_daily (day, item_count, price_sum)
+    SELECT date(created_at), COUNT(*), TOTAL(price) FROM items GROUP BY 1
+    ''',
+]
+
+# Schema history of auction.db. The applied version is kept in
+# PRAGMA user_version; append new migrations, never edit applied ones.
+MIGRATIONS = [
+    Migration(1, "create items table", [
+        '''
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            price REAL NOT NULL CHECK(price >= 0),
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    Migration(2, "index items by created_at and price", [
+        # id is the rowid and is stored in every index, so this index also
+        # serves ORDER BY created_at DESC, id DESC and the keyset cursor
+        'CREATE INDEX IF NOT EXISTS idx_items_created_at ON items (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_items_price ON items (price)',
+    ]),
+    Migration(3, "track item and collection versions for HTTP caching", [
+        'ALTER TABLE items ADD COLUMN updated_at DATETIME',
+        'ALTER TABLE items ADD COLUMN version INTEGER NOT NULL DEFAULT 1',
+        'UPDATE items SET updated_at = created_at',
+        # Single-row collection version, bumped by triggers in the same
+        # transaction as every change to items, whoever the writer is.
+        # bulk_load is only ever set inside a POST /items/bulk transaction:
+        # it switches the per-row insert triggers off while the chunk is
+        # indexed, counted and versioned once per chunk instead
+        '''
+        CREATE TABLE IF NOT EXISTS items_state (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            version INTEGER NOT NULL,
+            updated_at DATETIME NOT NULL,
+            bulk_load INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        "INSERT OR IGNORE INTO items_state (id, version, updated_at) VALUES (1, 0, CURRENT_TIMESTAMP)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS items_state_on_insert AFTER INSERT ON items
+        WHEN NOT EXISTS (SELECT 1 FROM items_state WHERE id = 1 AND bulk_load) BEGIN
+            UPDATE items_state SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS items_state_on_update AFTER UPDATE ON items BEGIN
+            UPDATE items_state SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS items_state_on_delete AFTER DELETE ON items BEGIN
+            UPDATE items_state SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+        END
+        ''',
+    ]),
+    Migration(4, "full-text index over item name and description", [
+        # External content table: the text lives in items only and every
+        # insert, update and delete is mirrored by a trigger. Bulk loads index
+        # their rows with one statement per chunk, ~5x faster than the trigger
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+            name, description,
+            content='items', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS items_fts_on_insert AFTER INSERT ON items
+        WHEN NOT EXISTS (SELECT 1 FROM items_state WHERE id = 1 AND bulk_load) BEGIN
+            INSERT INTO items_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS items_fts_on_delete AFTER DELETE ON items BEGIN
+            INSERT INTO items_fts (items_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS items_fts_on_update AFTER UPDATE OF name, description ON items BEGIN
+            INSERT INTO items_fts (items_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO items_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+        ''',
+        "INSERT INTO items_fts (items_fts) VALUES ('rebuild')",
+    ]),
+    Migration(5, "covering indexes for filtered and sorted listings", [
+        # Each index starts with its filter or sort key, then id so that
+        # ORDER BY key, id needs no temporary b-tree, then every Item field
+        # except description, so projections without it never touch the table
+        'DROP INDEX IF EXISTS idx_items_created_at',
+        'DROP INDEX IF EXISTS idx_items_price',
+        'CREATE INDEX idx_items_created_at ON items (created_at, id, name, price)',
+        'CREATE INDEX idx_items_price ON items (price, id, name, created_at)',
+        # Serves name_prefix as a range on name
+        'CREATE INDEX idx_items_name ON items (name, price, created_at)',
+    ]),
+    Migration(6, "summary tables for item statistics", [
+        # Totals over all items and per day of created_at, kept by insert,
+        # update and delete triggers like the full-text index. Bulk loads
+        # count their rows once per chunk instead of through the insert trigger
+        '''
+        CREATE TABLE IF NOT EXISTS items_stats (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            item_count INTEGER NOT NULL,
+            price_sum REAL NOT NULL,
+            min_price REAL,
+            max_price REAL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS items_daily (
+            day TEXT PRIMARY KEY,
+            item_count INTEGER NOT NULL,
+            price_sum REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS items_stats_on_insert AFTER INSERT ON items
+        WHEN NOT EXISTS (SELECT 1 FROM items_state WHERE id = 1 AND bulk_load) BEGIN
+            UPDATE items_stats SET
+                item_count = item_count + 1,
+                price_sum = price_sum + new.price,
+                min_price = MIN(COALESCE(min_price, new.price), new.price),
+                max_price = MAX(COALESCE(max_price, new.price), new.price)
+            WHERE id = 1;
+            INSERT INTO items_daily (day, item_count, price_sum)
+            VALUES (date(new.created_at), 1, new.price)
+            ON CONFLICT (day) DO UPDATE SET item_count = item_count + 1,
+                                            price_sum = price_sum + excluded.price_sum;
+        END
+        ''',
+        # A bound that leaves the table is recomputed from idx_items_price,
+        # which is a single index lookup
+        '''
+        CREATE TRIGGER IF NOT EXISTS items_stats_on_delete AFTER DELETE ON items BEGIN
+            UPDATE items_stats SET
+                item_count = item_count - 1,
+                price_sum = price_sum - old.price,
+                min_price = CASE WHEN old.price <= min_price
+                                 THEN (SELECT MIN(price) FROM items) ELSE min_price END,
+                max_price = CASE WHEN old.price >= max_price
+                                 THEN (SELECT MAX(price) FROM items) ELSE max_price END
+            WHERE id = 1;
+            UPDATE items_daily SET item_count = item_count - 1, price_sum = price_sum - old.price
+            WHERE day = date(old.created_at);
+            DELETE FROM items_daily WHERE day = date(old.created_at) AND item_count = 0;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS items_stats_on_update AFTER UPDATE OF price ON items BEGIN
+            UPDATE items_stats SET
+                price_sum = price_sum - old.price + new.price,
+                min_price = CASE WHEN old.price <= min_price
+                                 THEN (SELECT MIN(price) FROM items) ELSE MIN(min_price, new.price) END,
+                max_price = CASE WHEN old.price >= max_price
+                                 THEN (SELECT MAX(price) FROM items) ELSE MAX(max_price, new.price) END
+            WHERE id = 1;
+            UPDATE items_daily SET price_sum = price_sum - old.price + new.price
+            WHERE day = date(old.created_at);
+        END
+        ''',
+        *REBUILD_ITEM_STATS,
+    ]),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, migrations: List[Migration] = MIGRATIONS) -> int:
+    """Apply pending migrations in order and return the resulting version.
+
+    Each migration runs in its own BEGIN IMMEDIATE transaction together with
+    the user_version bump, so a failed migration leaves the previous version
+    in place and concurrent callers never apply the same step twice.
+    """
+    for migration in migrations:
+        if schema_version(conn) >= migration.version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock
+            if schema_version(conn) >= migration.version:
+                conn.rollback()
+                continue
+            for statement in migration.statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {migration.version}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return schema_version(conn)
+
+
+def migrate_database(database: str, pragmas: Optional[Dict[str, object]] = None) -> int:
+    """Apply ``pragmas`` and pending migrations to a database file.
+
+    Serialised through a lock file next to the database: of several
+    processes starting together, one runs the DDL and the others find the
+    schema current and change nothing.
+    """
+    with file_lock(database + ".lock"):
+        conn = sqlite3.connect(database)
+        try:
+            apply_pragmas(conn, pragmas or {})
+            return migrate(conn)
+        finally:
+            conn.close()
@@ -0,0 +1,145 @@
+"""Cold-start profile: import times and time to first response.
+
+Runs `python -X importtime -c "import server"` in a fresh interpreter
+and breaks the import down per module (self and cumulative time) and
+per top-level package, with the app's own modules marked. Then starts
+`uvicorn server:app` --runs times on a fresh database and measures the
+time from spawning the process to the first successful response, which
+adds interpreter startup, the lifespan (schema checks, pools) and the
+first request to the imports.
+
+Bytecode is not cached when PYTHONDONTWRITEBYTECODE is set, so every
+start compiles the app modules again; images should run
+`python -m compileall` at build time.
+
+    python profile_startup.py --top 15 --runs 5 --budget 3
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import List, NamedTuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_MODULES = {name[:-3] for name in os.listdir(HERE) if name.endswith(".py")}
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def fresh_env(database: str) -> dict:
+    return dict(os.environ, AUCTION_DB=database)
+
+
+def import_times(module: str = "server") -> List[ImportTime]:
+    with tempfile.TemporaryDirectory() as tmp:
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=HERE, env=fresh_env(os.path.join(tmp, "auction.db")),
+                                stderr=subprocess.PIPE, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append(ImportTime(name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def by_package(entries: List[ImportTime]) -> dict:
+    totals = {}
+    for entry in entries:
+        package = entry.module.split(".")[0]
+        totals[package] = totals.get(package, 0) + entry.self_us
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def time_to_first_response(database: str, path: str = "/items/stats", timeout: float = 60.0) -> float:
+    """Seconds from spawning `uvicorn server:app` until ``path`` answers 200."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", "0", "--log-level", "info",
+         "--no-access-log"],
+        cwd=HERE, env=fresh_env(database), stderr=subprocess.PIPE, text=True)
+    try:
+        # uvicorn logs the bound address once the lifespan has started
+        for line in process.stderr:
+            match = re.search(r"http://[\d.]+:\d+", line)
+            if match:
+                break
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("uvicorn did not start in time")
+        else:
+            raise RuntimeError(f"uvicorn exited with status {process.wait()}")
+        while True:
+            try:
+                with urllib.request.urlopen(match.group(0) + path, timeout=timeout) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                if time.perf_counter() - started > timeout:
+                    raise
+                time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+        process.stderr.close()
+
+
+def interpreter_startup() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - started
+
+
+def run(args) -> int:
+    entries = import_times(args.module)
+    total = sum(entry.self_us for entry in entries)
+    own = sum(entry.self_us for entry in entries if entry.module.split(".")[0] in APP_MODULES)
+    print(f"import {args.module}: {total / 1000:.1f} ms in {len(entries)} modules, "
+          f"{own / 1000:.1f} ms in the app's own modules")
+    if os.environ.get("PYTHONDONTWRITEBYTECODE"):
+        print("PYTHONDONTWRITEBYTECODE is set: bytecode is compiled on every start")
+
+    print(f"\n{'self ms':>9} {'cumul ms':>9}  module (top {args.top} by self time)")
+    for entry in sorted(entries, key=lambda entry: entry.self_us, reverse=True)[:args.top]:
+        mark = " *" if entry.module.split(".")[0] in APP_MODULES else ""
+        print(f"{entry.self_us / 1000:>9.1f} {entry.cumulative_us / 1000:>9.1f}  {entry.module}{mark}")
+
+    print(f"\n{'self ms':>9}  package (top {args.top})")
+    for package, self_us in list(by_package(entries).items())[:args.top]:
+        mark = " *" if package in APP_MODULES else ""
+        print(f"{self_us / 1000:>9.1f}  {package}{mark}")
+
+    baseline = interpreter_startup()
+    samples = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            samples.append(time_to_first_response(os.path.join(tmp, "auction.db"), args.path))
+    median = statistics.median(samples)
+    print(f"\ninterpreter startup {baseline * 1000:.0f} ms, time to first response of {args.path}: "
+          f"median {median * 1000:.0f} ms, max {max(samples) * 1000:.0f} ms over {args.runs} runs")
+    if args.budget and median > args.budget:
+        print(f"OVER BUDGET: {median:.2f}s > {args.budget:.2f}s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/items/stats")
+    parser.add_argument("--budget", type=float, default=0.0,
+                        help="exit with status 1 when the median time to first response exceeds it")
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,191 @@
+"""Production entry point: a pre-forking supervisor of uvicorn workers.
+
+The supervisor migrates the database once (under the lock file of
+migrations.migrate_database), binds the listening socket and forks
+--workers processes that accept on it. Each worker imports server.py
+after the fork and opens its own pools on the shared WAL database.
+
+Signals sent to the supervisor:
+
+    SIGTERM, SIGINT  graceful shutdown: workers stop accepting, finish
+                     in-flight requests and exit; stragglers are killed
+                     after --graceful-timeout
+    SIGHUP           graceful reload: workers are replaced one by one,
+                     a new one is started before the old one is stopped
+    SIGTTIN, SIGTTOU add or remove one worker
+
+Workers that die unexpectedly are restarted. Per-process state is not
+shared, so every worker runs without the item cache, since a write in
+one process could not invalidate the others, and /items/changes answers
+503, since each worker's feed would only carry the writes that worker
+handled and event ids would collide across them. This holds for
+--workers 1 too, as SIGTTIN can add workers at any time; run
+`uvicorn server:app` for a single process with both.
+
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+from db import WAL_PROFILE
+from migrations import migrate_database
+
+WORKER_SIGNALS = (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU, signal.SIGTERM, signal.SIGINT)
+# Minimum seconds between restarts of crashed workers, so a broken build
+# does not fork in a tight loop
+RESPAWN_DELAY = 1.0
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, log_level: str):
+    for signum in WORKER_SIGNALS:
+        signal.signal(signum, signal.SIG_DFL)
+    os.environ["AUCTION_ITEM_CACHE_SIZE"] = "0"
+    os.environ["AUCTION_CHANGES_FEED"] = "0"
+    # Drop the app modules the supervisor imported and import them after
+    # the fork, so that SIGHUP loads new code
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name, module in list(sys.modules.items()):
+        if name != "__main__" and os.path.dirname(os.path.abspath(getattr(module, "__file__", None) or "/")) == here:
+            del sys.modules[name]
+    import uvicorn
+    import server
+
+    uvicorn.Server(uvicorn.Config(server.app, log_level=log_level)).run(sockets=[sock])
+
+
+class Supervisor:
+    def __init__(self, sock: socket.socket, workers: int, log_level: str = "info",
+                 graceful_timeout: float = 30.0):
+        self.sock = sock
+        self.target = workers
+        self.log_level = log_level
+        self.graceful_timeout = graceful_timeout
+        self.workers = set()
+        self.retiring = {}  # pid -> time the worker was asked to stop
+        self.signals = []
+        self.stopping = False
+        self.last_respawn = 0.0
+
+    def log(self, message: str):
+        print(f"[supervisor {os.getpid()}] {message}", file=sys.stderr, flush=True)
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.sock, self.log_level)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers.add(pid)
+        self.log(f"started worker {pid}")
+        return pid
+
+    def retire(self, pid: int, signum: int = signal.SIGTERM):
+        self.workers.discard(pid)
+        self.retiring.setdefault(pid, time.monotonic())
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def on_signal(self, signum, frame):
+        self.signals.append(signum)
+
+    def handle_signals(self):
+        while self.signals:
+            signum = self.signals.pop(0)
+            if signum in (signal.SIGTERM, signal.SIGINT):
+                self.log("shutting down")
+                self.stopping = True
+                for pid in list(self.workers):
+                    self.retire(pid)
+            elif signum == signal.SIGHUP:
+                self.log("reloading workers")
+                for pid in list(self.workers):
+                    self.spawn()
+                    self.retire(pid)
+            elif signum == signal.SIGTTIN:
+                self.target += 1
+            elif signum == signal.SIGTTOU and self.target > 1:
+                self.target -= 1
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.workers:
+                self.log(f"worker {pid} exited unexpectedly with status {status}")
+            self.workers.discard(pid)
+            self.retiring.pop(pid, None)
+
+    def run(self) -> int:
+        for signum in WORKER_SIGNALS:
+            signal.signal(signum, self.on_signal)
+        while not self.stopping or self.workers or self.retiring:
+            self.handle_signals()
+            self.reap()
+            now = time.monotonic()
+            for pid, since in list(self.retiring.items()):
+                if now - since > self.graceful_timeout:
+                    self.log(f"killing worker {pid} after {self.graceful_timeout:.0f}s")
+                    os.kill(pid, signal.SIGKILL)
+                    self.retiring[pid] = float("inf")
+            if not self.stopping:
+                while len(self.workers) > self.target:
+                    self.retire(max(self.workers))
+                if len(self.workers) < self.target and now - self.last_respawn >= RESPAWN_DELAY:
+                    self.last_respawn = now
+                    while len(self.workers) < self.target:
+                        self.spawn()
+            time.sleep(0.05)
+        self.sock.close()
+        return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--db", help="database file (default: AUCTION_DB or auction.db)")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        os.environ["AUCTION_DB"] = args.db
+    database = os.environ.get("AUCTION_DB", "auction.db")
+    # Same profile as server.STORAGE_PROFILE, without importing the app here
+    version = migrate_database(database, WAL_PROFILE)
+    sock = bind_socket(args.host, args.port)
+    supervisor = Supervisor(sock, args.workers, args.log_level, args.graceful_timeout)
+    supervisor.log(f"schema version {version}, serving {database} on "
+                   f"http://{args.host}:{sock.getsockname()[1]} with {args.workers} workers")
+    return supervisor.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,150 @@
-from fastapi import FastAPI, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import List, Literal, Optional
+import base64
+import json
+import math
+import os
 import sqlite3
-from contextlib import contextmanager
+import zlib
+from contextlib import asynccontextmanager
+from functools import partial
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 
-app = FastAPI()
+from cache import LRUCache
+from changes import ChangeFeed
+from db import WAL_PROFILE, ConnectionPool, DBExecutor, WriteBatcher, connection_pragmas
+from metrics import MetricsMiddleware, Registry
+from migrations import REBUILD_ITEM_STATS, migrate_database
 
-# Database connection manager
-@contextmanager
-def get_db_connection():
-    conn = sqlite3.connect('auction.db')
-    conn.row_factory = sqlite3.Row  # This allows accessing columns by name
+DATABASE = os.environ.get("AUCTION_DB", "auction.db")
+# "sync" runs queries in the threadpool on pooled connections, "async" sends
+# them to dedicated DB executor threads fed from a queue
+DB_BACKEND = os.environ.get("AUCTION_DB_BACKEND", "sync")
+STORAGE_PROFILE = WAL_PROFILE
+POOL_SIZE = int(os.environ.get("AUCTION_POOL_SIZE", "5"))
+POOL_TIMEOUT = float(os.environ.get("AUCTION_POOL_TIMEOUT", "30"))
+# Optional pool of read-only connections for GET handlers, 0 disables it
+READ_POOL_SIZE = int(os.environ.get("AUCTION_READ_POOL_SIZE", "0"))
+MAX_PAGE_SIZE = 1000
+# Rows fetched from the cursor per chunk when streaming GET /items/
+STREAM_BATCH_SIZE = 500
+# Render GET /items/ straight from row tuples instead of validating every
+# row through List[Item]; the output is byte-identical
+FAST_JSON = os.environ.get("AUCTION_FAST_JSON", "0") == "1"
+# Rows validated and inserted per executemany call in POST /items/bulk
+BULK_CHUNK_SIZE = 1000
+
+# Change feed: events kept for resuming, per-subscriber queue bound, and the
+# idle interval after which a keepalive comment is sent. The feed only sees
+# this process's writes, so serve.py turns it off in its workers with
+# AUCTION_CHANGES_FEED=0
+CHANGES_FEED = os.environ.get("AUCTION_CHANGES_FEED", "1") == "1"
+CHANGES_HISTORY = int(os.environ.get("AUCTION_CHANGES_HISTORY", "1000"))
+CHANGES_QUEUE_SIZE = int(os.environ.get("AUCTION_CHANGES_QUEUE_SIZE", "256"))
+CHANGES_KEEPALIVE = 15.0
+
+# Group commit: writes arriving within the linger time share one transaction
+GROUP_COMMIT = os.environ.get("AUCTION_GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("AUCTION_GROUP_COMMIT_MAX_BATCH", "64"))
+GROUP_COMMIT_LINGER_MS = float(os.environ.get("AUCTION_GROUP_COMMIT_LINGER_MS", "2"))
+
+# Read-through cache of serialized items for GET /items/{item_id}, 0 disables it
+ITEM_CACHE_SIZE = int(os.environ.get("AUCTION_ITEM_CACHE_SIZE", "10000"))
+ITEM_CACHE_TTL = float(os.environ.get("AUCTION_ITEM_CACHE_TTL", "60"))
+
+# Request and stage metrics served on /metrics
+METRICS = os.environ.get("AUCTION_METRICS", "1") == "1"
+
+# Statement tracing: statements slower than the threshold are logged with
+# their query plan, and per-statement stats are served on /queries/stats
+QUERY_LOG = os.environ.get("AUCTION_QUERY_LOG", "0") == "1"
+SLOW_QUERY_MS = float(os.environ.get("AUCTION_SLOW_QUERY_MS", "100"))
+QUERY_LOG_TOP = int(os.environ.get("AUCTION_QUERY_LOG_TOP", "20"))
+
+# Shared connection pools, opened on startup and closed on shutdown
+pool: Optional[ConnectionPool] = None
+read_pool: Optional[ConnectionPool] = None
+executor: Optional[DBExecutor] = None
+write_batcher: Optional[WriteBatcher] = None
+query_log = None
+if QUERY_LOG:
+    # Imported only when enabled, like uvicorn under __main__: see
+    # profile_startup.py for what each import adds to a cold start
+    from sqltrace import QueryLog
+    query_log = QueryLog(threshold=SLOW_QUERY_MS / 1000, top_n=QUERY_LOG_TOP)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global pool, read_pool, executor, write_batcher
+    if DB_BACKEND not in ("sync", "async"):
+        raise ValueError(f"Unknown database backend: {DB_BACKEND}")
+    # Schema checks run here rather than on import, so that importing the
+    # app (tests, tools, the workers of serve.py) does not touch the database
+    await run_in_threadpool(init_db)
+    item_cache.clear()
+    pragmas = connection_pragmas(STORAGE_PROFILE)
+    if DB_BACKEND == "async":
+        executor = DBExecutor(DATABASE, workers=POOL_SIZE, pragmas=pragmas, query_log=query_log)
+    if GROUP_COMMIT:
+        write_batcher = WriteBatcher(DATABASE, pragmas=pragmas,
+                                     max_batch_size=GROUP_COMMIT_MAX_BATCH,
+                                     max_linger=GROUP_COMMIT_LINGER_MS / 1000,
+                                     query_log=query_log)
+    pool = ConnectionPool(DATABASE, size=POOL_SIZE, timeout=POOL_TIMEOUT, pragmas=pragmas,
+                          query_log=query_log)
+    if READ_POOL_SIZE > 0:
+        read_pool = ConnectionPool(DATABASE, size=READ_POOL_SIZE, timeout=POOL_TIMEOUT,
+                                   pragmas=pragmas, read_only=True, query_log=query_log)
     try:
-        yield conn
+        yield
     finally:
-        conn.close()
+        if write_batcher is not None:
+            write_batcher.close()
+            write_batcher = None
+        pool.close()
+        pool = None
+        if read_pool is not None:
+            read_pool.close()
+            read_pool = None
+        if executor is not None:
+            executor.close()
+            executor = None
+
+app = FastAPI(lifespan=lifespan)
+item_cache = LRUCache(max_size=ITEM_CACHE_SIZE, ttl=ITEM_CACHE_TTL)
+change_feed = ChangeFeed(history=CHANGES_HISTORY, queue_size=CHANGES_QUEUE_SIZE)
+
+metrics = Registry()
+http_requests = metrics.counter("auction_http_requests_total",
+                                "HTTP requests by method, route and status.", ["method", "route", "status"])
+http_latency = metrics.histogram("auction_http_request_duration_seconds",
+                                 "HTTP request latency, including the response body.", ["method", "route"])
+http_in_flight = metrics.gauge("auction_http_requests_in_flight",
+                               "HTTP requests being handled, open streams included.", ["method"])
+db_errors = metrics.counter("auction_db_errors_total",
+                            "sqlite3 errors raised by data access functions.", ["operation"])
+# sql: data access functions in the worker thread; rows: sqlite3.Row to dict
+# conversion; serialize: JSON rendering done by the app itself. Rendering
+# through response_model is left to FastAPI and only shows in the request latency.
+stage_latency = metrics.histogram("auction_stage_duration_seconds",
+                                  "Time spent per request stage and operation.", ["stage", "operation"])
+if METRICS:
+    app.add_middleware(MetricsMiddleware, requests=http_requests, latency=http_latency,
+                       in_flight=http_in_flight)
 
-# Database setup with better error handling
+# Database setup with better error handling. Safe to run from several
+# worker processes at once, see migrate_database()
 def init_db():
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                price REAL NOT NULL CHECK(price >= 0),
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-            conn.commit()
+        migrate_database(DATABASE, STORAGE_PROFILE)
     except sqlite3.Error as e:
         print(f"Database initialization error: {e}")
 
-init_db()
-
 class ItemCreate(BaseModel):
     name: str
     description: Optional[str] = None
@@ -57,87 +166,716 @@ class Item(ItemCreate):
     class Config:
         orm_mode = True
 
-# Dependency for database connection
-def get_db():
-    with get_db_connection() as conn:
-        yield conn
+class SearchResult(Item):
+    rank: float
+    snippet: Optional[str] = None
+
+# Serialize a row exactly as FastAPI would render it through response_model=Item
+def render_item(row: sqlite3.Row) -> bytes:
+    with stage_latency.time("serialize", "render_item"):
+        content = jsonable_encoder(Item(**dict(row)))
+        return json.dumps(content, ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
+
+def item_response(body: bytes, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    return Response(content=body, status_code=status_code, headers=headers,
+                    media_type="application/json")
+
+# HTTP validators. Item ETags come from the row version that update_item
+# bumps; the collection ETag from the items_state version that triggers bump
+# on every change to items, combined with the query string since each page
+# is its own resource
+def http_date(timestamp: Optional[str]) -> Optional[str]:
+    if not timestamp:
+        return None
+    moment = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return format_datetime(moment, usegmt=True)
+
+def item_validators(row: sqlite3.Row) -> dict:
+    headers = {"ETag": f'"{row["id"]}-{row["version"]}"'}
+    last_modified = http_date(row["updated_at"] or row["created_at"])
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+def collection_validators(state: sqlite3.Row, query: str) -> dict:
+    headers = {"ETag": f'"items-{state["version"]}-{zlib.crc32(query.encode()):08x}"'}
+    last_modified = http_date(state["updated_at"])
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+# If-None-Match takes precedence over If-Modified-Since (RFC 7232, 6)
+def not_modified(request: Request, validators: dict) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or validators["ETag"] in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in validators:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return parsedate_to_datetime(validators["Last-Modified"]) <= since
+    return False
+
+def not_modified_response(validators: dict) -> Response:
+    return Response(status_code=304, headers=validators)
+
+# Cache entry for GET /items/{item_id}: rendered body plus its validators
+def item_cache_entry(row: sqlite3.Row):
+    return render_item(row), item_validators(row)
+
+# Column order of the Item model, for rows rendered without the model
+ITEM_FIELDS = ("name", "description", "price", "id", "created_at")
+ITEM_COLUMNS = ', '.join(ITEM_FIELDS)
+# The same string encoder json.dumps uses with ensure_ascii=False
+encode_json_str = json.encoder.encode_basestring
+
+def encode_json_value(value) -> str:
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return encode_json_str(value)
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            raise ValueError("Out of range float values are not JSON compliant")
+        return float.__repr__(value)
+    return int.__repr__(value)
+
+# Encode a trusted (name, description, price, id, created_at) row tuple
+# exactly as render_item() would encode the validated model
+def encode_item_tuple(row: tuple) -> str:
+    name, description, price, item_id, created_at = row
+    return (f'{{"name":{encode_json_str(name)},'
+            f'"description":{encode_json_value(description)},'
+            f'"price":{encode_json_value(float(price))},'
+            f'"id":{int.__repr__(item_id)},'
+            f'"created_at":{encode_json_value(created_at)}}}')
+
+FIELD_ENCODERS = {
+    "name": encode_json_str,
+    "description": encode_json_value,
+    "price": lambda value: encode_json_value(float(value)),
+    "id": int.__repr__,
+    "created_at": encode_json_value,
+}
+
+# Encoder for rows whose leading columns are the given fields; columns past
+# them (cursor keys that were not requested) are left out of the output
+def projection_encoder(fields: tuple):
+    if fields == ITEM_FIELDS:
+        return encode_item_tuple
+    encoders = [(encode_json_str(field), FIELD_ENCODERS[field]) for field in fields]
+    def encode(row: tuple) -> str:
+        return "{" + ",".join(f"{name}:{encoder(value)}"
+                              for (name, encoder), value in zip(encoders, row)) + "}"
+    return encode
+
+# Parse fields=id,name,price into Item fields in model order
+def parse_fields(fields: Optional[str]) -> tuple:
+    if fields is None:
+        return ITEM_FIELDS
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(ITEM_FIELDS)
+    if unknown or not requested:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown fields: {', '.join(sorted(unknown))}" if unknown
+                            else "fields must name at least one field")
+    return tuple(field for field in ITEM_FIELDS if field in requested)
+
+# Selected columns for a projection: the fields, then the sort key and id
+# when they were not requested, since the next-page cursor is built from them
+def projection_columns(fields: tuple, sort: str) -> list:
+    columns = list(fields)
+    for column in (sort, "id"):
+        if column not in columns:
+            columns.append(column)
+    return columns
+
+# Connection for reads; uses the read-only pool when enabled
+def read_connection():
+    return (read_pool or pool).connection()
+
+def call_with_connection(connection, fn, args):
+    with connection() as conn, conn:
+        return fn(conn, *args)
+
+def timed_query(fn, conn: sqlite3.Connection, *args):
+    with stage_latency.time("sql", fn.__name__):
+        return fn(conn, *args)
+
+# Run a data access function without blocking the event loop
+async def run_db(fn, *args, read: bool = False):
+    call = partial(timed_query, fn) if METRICS else fn
+    try:
+        if write_batcher is not None and not read:
+            return await write_batcher.run(call, *args)
+        if executor is not None:
+            return await executor.run(call, *args)
+        connection = read_connection if read else pool.connection
+        return await run_in_threadpool(call_with_connection, connection, call, args)
+    except sqlite3.Error:
+        db_errors.inc(fn.__name__)
+        raise
+
+# Data access shared by all backends. Functions never commit: the caller
+# runs each one in a transaction, or several in one group commit
+INSERT_ITEM_SQL = ('INSERT INTO items (name, description, price, updated_at) '
+                   'VALUES (?, ?, ?, CURRENT_TIMESTAMP)')
+UPDATE_ITEM_SQL = ('UPDATE items SET name = ?, description = ?, price = ?, '
+                   'updated_at = CURRENT_TIMESTAMP, version = version + 1 WHERE id = ?')
+# RETURNING (SQLite 3.35+) gives back the stored row from the write itself;
+# older builds read it back with a second query
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+# Bulk loads switch the per-row insert triggers off, then index and count
+# each chunk with one statement per table over its id range and bump the
+# collection version once
+BUMP_ITEMS_STATE_SQL = ('UPDATE items_state SET version = version + 1, '
+                        'updated_at = CURRENT_TIMESTAMP WHERE id = 1')
+BULK_LOAD_SQL = 'UPDATE items_state SET bulk_load = ? WHERE id = 1'
+INDEX_ITEMS_SQL = ('INSERT INTO items_fts (rowid, name, description) '
+                   'SELECT id, name, description FROM items WHERE id BETWEEN ? AND ?')
+COUNT_ITEMS_SQL = '''
+UPDATE items_stats SET
+    item_count = item_count + added.n,
+    price_sum = price_sum + added.total,
+    min_price = MIN(COALESCE(min_price, added.lo), added.lo),
+    max_price = MAX(COALESCE(max_price, added.hi), added.hi)
+FROM (SELECT COUNT(*) AS n, TOTAL(price) AS total, MIN(price) AS lo, MAX(price) AS hi
+      FROM items WHERE id BETWEEN ? AND ?) AS added
+WHERE items_stats.id = 1 AND added.n > 0
+'''
+COUNT_ITEMS_DAILY_SQL = '''
+INSERT INTO items_daily (day, item_count, price_sum)
+SELECT date(created_at), COUNT(*), TOTAL(price) FROM items WHERE id BETWEEN ? AND ? GROUP BY 1
+ON CONFLICT (day) DO UPDATE SET item_count = item_count + excluded.item_count,
+                                price_sum = price_sum + excluded.price_sum
+'''
+
+# Index and count the rows with ids first_id..last_id, inserted by the caller with bulk_load set
+def index_new_items(conn: sqlite3.Connection, first_id: int, last_id: int):
+    conn.execute(INDEX_ITEMS_SQL, (first_id, last_id))
+    conn.execute(COUNT_ITEMS_SQL, (first_id, last_id))
+    conn.execute(COUNT_ITEMS_DAILY_SQL, (first_id, last_id))
+
+def insert_item_row(conn: sqlite3.Connection, item: ItemCreate) -> sqlite3.Row:
+    params = (item.name, item.description, item.price)
+    if HAS_RETURNING:
+        row = conn.execute(INSERT_ITEM_SQL + ' RETURNING *', params).fetchone()
+    else:
+        cursor = conn.execute(INSERT_ITEM_SQL, params)
+        row = conn.execute('SELECT * FROM items WHERE id = ?', (cursor.lastrowid,)).fetchone()
+    return row
+
+def select_item_rows(conn: sqlite3.Connection, sql: str, params: list) -> List[sqlite3.Row]:
+    return conn.execute(sql, params).fetchall()
+
+# Fetch row tuples and render them to a JSON array in the worker thread;
+# returns the body and the (sort key, id) of the next page, if any. key gives
+# the positions of the sort column and id among the selected columns.
+def select_items_json(conn: sqlite3.Connection, sql: str, params: list, limit: Optional[int],
+                      encode=encode_item_tuple, key: tuple = (4, 3)):
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(sql, params).fetchall()
+    next_key = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_key = (rows[-1][key[0]], rows[-1][key[1]])
+    # Also part of the sql time of this function, which runs in the worker
+    with stage_latency.time("serialize", "select_items_json"):
+        body = "[" + ",".join(map(encode, rows)) + "]"
+        return body.encode("utf-8"), next_key
+
+def select_item_row(conn: sqlite3.Connection, item_id: int) -> Optional[sqlite3.Row]:
+    return conn.execute('SELECT * FROM items WHERE id = ?', (item_id,)).fetchone()
+
+# Full-text search over items_fts, best bm25 rank first; name matches
+# weigh ten times more than description matches
+SEARCH_SQL = '''
+SELECT items.*,
+       bm25(items_fts, 10.0, 1.0) AS rank,
+       snippet(items_fts, -1, '<mark>', '</mark>', '…', 12) AS snippet
+FROM items_fts JOIN items ON items.id = items_fts.rowid
+WHERE items_fts MATCH ?
+ORDER BY rank
+LIMIT ? OFFSET ?
+'''
+
+# Turn free text into an FTS5 query: every word must match, the last one as
+# a prefix, and quoting keeps user input out of the FTS5 query syntax
+def fts_query(text: str) -> Optional[str]:
+    words = ["".join(ch for ch in word if ch.isalnum()) for word in text.split()]
+    words = [word for word in words if word]
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+def search_item_rows(conn: sqlite3.Connection, query: str, limit: int, offset: int) -> List[sqlite3.Row]:
+    return conn.execute(SEARCH_SQL, (query, limit, offset)).fetchall()
+
+def select_items_state(conn: sqlite3.Connection) -> sqlite3.Row:
+    return conn.execute('SELECT version, updated_at FROM items_state WHERE id = 1').fetchone()
+
+# Summary of all items and of the most recent days, read from the tables
+# maintained by the write paths; days=-1 returns every day
+def select_item_stats(conn: sqlite3.Connection, days: int) -> dict:
+    count, price_sum, min_price, max_price = conn.execute(
+        'SELECT item_count, price_sum, min_price, max_price FROM items_stats WHERE id = 1').fetchone()
+    daily = conn.execute('SELECT day, item_count, price_sum FROM items_daily '
+                         'ORDER BY day DESC LIMIT ?', (days,)).fetchall()
+    return {
+        "count": count,
+        "min_price": min_price,
+        "max_price": max_price,
+        "avg_price": price_sum / count if count else None,
+        "total_price": price_sum,
+        "days": [{"day": day, "count": day_count, "total_price": day_sum}
+                 for day, day_count, day_sum in daily],
+    }
+
+# Recompute the summary tables from items and report what they held before
+def rebuild_item_stats(conn: sqlite3.Connection):
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    before = select_item_stats(conn, -1)
+    for statement in REBUILD_ITEM_STATS:
+        conn.execute(statement)
+    return before, select_item_stats(conn, -1)
+
+# Counts must match exactly; sums kept by adding and subtracting floats may
+# differ from a fresh TOTAL() in the last bits
+def same_stats(before: dict, after: dict) -> bool:
+    def close(a, b):
+        return a == b or (a is not None and b is not None and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6))
+    pairs = [(before, after)] + list(zip(before["days"], after["days"]))
+    return (len(before["days"]) == len(after["days"])
+            and all(a["count"] == b["count"] and a.get("day") == b.get("day")
+                    and close(a["total_price"], b["total_price"]) for a, b in pairs)
+            and all(close(before[key], after[key]) for key in ("min_price", "max_price")))
+
+def update_item_row(conn: sqlite3.Connection, item_id: int, item: ItemCreate) -> Optional[sqlite3.Row]:
+    params = (item.name, item.description, item.price, item_id)
+    if HAS_RETURNING:
+        row = conn.execute(UPDATE_ITEM_SQL + ' RETURNING *', params).fetchone()
+    elif conn.execute(UPDATE_ITEM_SQL, params).rowcount == 0:
+        row = None
+    else:
+        row = conn.execute('SELECT * FROM items WHERE id = ?', (item_id,)).fetchone()
+    return row
+
+def delete_item_row(conn: sqlite3.Connection, item_id: int) -> bool:
+    return conn.execute('DELETE FROM items WHERE id = ?', (item_id,)).rowcount > 0
+
+# Keyset cursors are an opaque encoding of the (sort key, id) of the last row
+def encode_cursor(key, item_id: int) -> str:
+    raw = json.dumps([key, item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str = "created_at"):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, item_id = json.loads(raw)
+        return (float(key) if sort == "price" else str(key)), int(item_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+SORT_COLUMNS = ("created_at", "price")
+
+# Smallest string greater than every string starting with prefix, so that a
+# prefix match is a range on the name index (BINARY collation, case-sensitive)
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    if ord(prefix[-1]) == 0x10FFFF:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+# Compile the listing parameters into one parameterised query. Every filter
+# is a range on an indexed column and the ORDER BY matches the (key, id)
+# prefix of idx_items_created_at or idx_items_price, see migration 5.
+def items_page_query(after: Optional[str], limit: Optional[int], columns: str = '*',
+                     sort: str = "created_at", order: str = "desc",
+                     min_price: Optional[float] = None, max_price: Optional[float] = None,
+                     name_prefix: Optional[str] = None):
+    if sort not in SORT_COLUMNS or order not in ("asc", "desc"):
+        raise ValueError(f"Unsupported sort: {sort} {order}")
+    conditions, params = [], []
+    if min_price is not None:
+        conditions.append('price >= ?')
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append('price <= ?')
+        params.append(max_price)
+    if name_prefix:
+        conditions.append('name >= ?')
+        params.append(name_prefix)
+        upper = prefix_upper_bound(name_prefix)
+        if upper is not None:
+            conditions.append('name < ?')
+            params.append(upper)
+    if after is not None:
+        conditions.append(f'({sort}, id) {"<" if order == "desc" else ">"} (?, ?)')
+        params.extend(decode_cursor(after, sort))
+    sql = f'SELECT {columns} FROM items'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += f' ORDER BY {sort} {order.upper()}, id {order.upper()}'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    return sql, params
+
+def stream_items(sql: str, params: list, fmt: str, encode=encode_item_tuple):
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(sql, params)
+        if fmt == "json":
+            yield "["
+        first = True
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            with stage_latency.time("serialize", "stream_items"):
+                lines = [encode(row) for row in rows]
+            if fmt == "ndjson":
+                yield "\n".join(lines) + "\n"
+            else:
+                yield ("" if first else ",") + ",".join(lines)
+            first = False
+        if fmt == "json":
+            yield "]"
+
+@app.get("/pool/stats")
+def get_pool_stats():
+    return {
+        "healthy": pool.check(),
+        **pool.stats(),
+        "read_pool": read_pool.stats() if read_pool is not None else None,
+        "executor": executor.stats() if executor is not None else None,
+        "write_queue": write_batcher.stats() if write_batcher is not None else None,
+    }
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/queries/stats")
+def get_query_stats(limit: int = Query(QUERY_LOG_TOP, ge=1, le=MAX_PAGE_SIZE),
+                    order: Literal["total", "calls", "max", "avg", "vm_steps"] = "total"):
+    if query_log is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "threshold_ms": query_log.threshold * 1000,
+        "top": query_log.top(limit, order),
+        "slow": query_log.slow_queries(),
+        "evicted": query_log.evicted,
+    }
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return item_cache.stats()
 
 @app.post("/items/", response_model=Item, status_code=201)
-def create_item(item: ItemCreate, conn: sqlite3.Connection = Depends(get_db)):
+async def create_item(item: ItemCreate):
     try:
         if item.price < 0:
             raise HTTPException(status_code=400, detail="Price cannot be negative")
 
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT INTO items (name, description, price)
-        VALUES (?, ?, ?)
-        ''', (item.name, item.description, item.price))
-        conn.commit()
+        token = item_cache.token()
+        row = await run_db(insert_item_row, item)
 
-        # Get the created item with all fields
-        cursor.execute('SELECT * FROM items WHERE id = ?', (cursor.lastrowid,))
-        row = cursor.fetchone()
+        body, validators = item_cache_entry(row)
+        item_cache.set(row["id"], (body, validators), token=token)
+        change_feed.publish("created", f'{{"id":{row["id"]},"item":{body.decode()}}}')
+        return item_response(body, status_code=201, headers=validators)
 
-        return dict(row)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+# Read the bulk body as chunks of raw rows: NDJSON is consumed line by line
+# as it arrives, anything else must be a single JSON array
+async def read_bulk_chunks(request: Request):
+    chunk = []
+    if "ndjson" in request.headers.get("content-type", ""):
+        buffer = b""
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    chunk.append(line)
+                if len(chunk) >= BULK_CHUNK_SIZE:
+                    yield chunk
+                    chunk = []
+        if buffer.strip():
+            chunk.append(buffer)
+    else:
+        try:
+            rows = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            yield rows[start:start + BULK_CHUNK_SIZE]
+        return
+    if chunk:
+        yield chunk
+
+def validate_bulk_chunk(chunk: list, offset: int, errors: list):
+    valid = []
+    for index, raw in enumerate(chunk, offset):
+        try:
+            data = json.loads(raw) if isinstance(raw, bytes) else raw
+            item = ItemCreate(**data)
+        except (ValueError, TypeError, ValidationError) as e:
+            errors.append({"index": index, "detail": str(e)})
+            continue
+        if item.price < 0:
+            errors.append({"index": index, "detail": "Price cannot be negative"})
+            continue
+        valid.append((index, (item.name, item.description, item.price)))
+    return valid
+
+# Insert one validated chunk inside the open transaction with the per-row
+# insert triggers off, then index and count it by id range. A row rejected by
+# SQLite raises; the caller rolls the transaction back. No savepoint: with
+# the insert triggers defined, one makes SQLite journal every row (~4x slower)
+def insert_bulk_rows(conn: sqlite3.Connection, valid: list):
+    conn.execute(BULK_LOAD_SQL, (1,))
+    conn.executemany(INSERT_ITEM_SQL, [params for _, params in valid])
+    # The write lock is held, so AUTOINCREMENT ids of the chunk are consecutive
+    last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    ids = list(range(last_id - len(valid) + 1, last_id + 1))
+    index_new_items(conn, ids[0], ids[-1])
+    # Cleared before the commit, so the flag is never seen outside the load
+    conn.execute(BULK_LOAD_SQL, (0,))
+    conn.execute(BUMP_ITEMS_STATE_SQL)
+    return ids
+
+# Validate and insert one chunk of a non-atomic load in its own transaction.
+# A chunk rejected by SQLite is rolled back and retried row by row, through
+# the insert triggers, so only the offending rows are reported.
+def ingest_chunk(conn: sqlite3.Connection, chunk: list, offset: int, errors: list):
+    valid = validate_bulk_chunk(chunk, offset, errors)
+    if not valid:
+        return []
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        ids = insert_bulk_rows(conn, valid)
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        conn.execute('BEGIN IMMEDIATE')
+        ids = []
+        for index, params in valid:
+            try:
+                ids.append(conn.execute(INSERT_ITEM_SQL, params).lastrowid)
+            except sqlite3.IntegrityError as e:
+                errors.append({"index": index, "detail": str(e)})
+    conn.commit()
+    return ids
+
+# Insert the validated chunks of an atomic load in one transaction. On error
+# the caller's pool.release() rolls it back.
+def ingest_chunks(conn: sqlite3.Connection, chunks: List[list]):
+    conn.execute('BEGIN IMMEDIATE')
+    ids = []
+    for valid in chunks:
+        if valid:
+            ids += insert_bulk_rows(conn, valid)
+    conn.commit()
+    return ids
 
+@app.post("/items/bulk", status_code=201)
+async def create_items_bulk(request: Request, atomic: bool = True):
+    # atomic=true loads everything in one transaction and inserts nothing if
+    # any row is invalid; atomic=false commits per chunk and reports bad rows
+    errors, ids, offset = [], [], 0
+    if atomic:
+        # Read and validate the whole body before taking the write lock, so
+        # a slow upload cannot hold BEGIN IMMEDIATE and block other writers
+        chunks = []
+        async for chunk in read_bulk_chunks(request):
+            chunks.append(await run_in_threadpool(validate_bulk_chunk, chunk, offset, errors))
+            offset += len(chunk)
+            if errors:
+                raise HTTPException(status_code=422, detail={"errors": errors})
+    conn = await run_in_threadpool(pool.acquire)
+    try:
+        if atomic:
+            ids = await run_in_threadpool(ingest_chunks, conn, chunks)
+        else:
+            async for chunk in read_bulk_chunks(request):
+                ids += await run_in_threadpool(ingest_chunk, conn, chunk, offset, errors)
+                offset += len(chunk)
+        if ids:
+            change_feed.publish("bulk_created", json.dumps({"ids": ids}))
+    except sqlite3.IntegrityError as e:
+        raise HTTPException(status_code=422, detail=f"Constraint violation: {str(e)}")
     except sqlite3.Error as e:
+        db_errors.inc("ingest_chunks" if atomic else "ingest_chunk")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        await run_in_threadpool(pool.release, conn)
+    return {"inserted": len(ids), "ids": ids, "errors": errors}
 
 @app.get("/items/", response_model=List[Item])
-def get_items(conn: sqlite3.Connection = Depends(get_db)):
+async def get_items(request: Request, response: Response,
+                    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                    after: Optional[str] = None,
+                    stream: Optional[Literal["ndjson", "json"]] = None,
+                    min_price: Optional[float] = Query(None, ge=0),
+                    max_price: Optional[float] = Query(None, ge=0),
+                    name_prefix: Optional[str] = Query(None, min_length=1),
+                    sort: Literal["created_at", "price"] = "created_at",
+                    order: Literal["asc", "desc"] = "desc",
+                    fields: Optional[str] = None):
+    # Without limit the whole table is returned, as before. With limit the
+    # cursor for the next page is sent in the X-Next-Cursor header.
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price cannot be greater than max_price")
+    projection = parse_fields(fields)
+    filters = dict(sort=sort, order=order, min_price=min_price, max_price=max_price,
+                   name_prefix=name_prefix)
     try:
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM items ORDER BY created_at DESC')
-        rows = cursor.fetchall()
+        # Answer conditional polls from items_state before running the listing
+        state = await run_db(select_items_state, read=True)
+        validators = collection_validators(state, request.url.query)
+        if not_modified(request, validators):
+            return not_modified_response(validators)
+        response.headers.update(validators)
+
+        if stream is not None:
+            sql, params = items_page_query(after, limit, ', '.join(projection), **filters)
+            media_type = "application/x-ndjson" if stream == "ndjson" else "application/json"
+            return StreamingResponse(stream_items(sql, params, stream, projection_encoder(projection)),
+                                     media_type=media_type, headers=validators)
+
+        # A projection cannot go through List[Item], so it is always rendered
+        # from tuples; without description the query reads only an index
+        if FAST_JSON or fields is not None:
+            columns = projection_columns(projection, sort)
+            sql, params = items_page_query(after, None if limit is None else limit + 1,
+                                           ', '.join(columns), **filters)
+            body, next_key = await run_db(select_items_json, sql, params, limit,
+                                          projection_encoder(projection),
+                                          (columns.index(sort), columns.index("id")), read=True)
+            fast_response = item_response(body, headers=validators)
+            if next_key is not None:
+                fast_response.headers["X-Next-Cursor"] = encode_cursor(*next_key)
+            return fast_response
+
+        sql, params = items_page_query(after, None if limit is None else limit + 1, **filters)
+        rows = await run_db(select_item_rows, sql, params, read=True)
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(rows[-1][sort], rows[-1]["id"])
+        with stage_latency.time("rows", "get_items"):
+            return [dict(row) for row in rows]
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+# Declared before /items/{item_id} so that the fixed paths are not taken for an id
+@app.get("/items/search", response_model=List[SearchResult])
+async def search_items(response: Response,
+                       q: str = Query(..., min_length=1),
+                       limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+                       offset: int = Query(0, ge=0)):
+    query = fts_query(q)
+    if query is None:
+        return []
+    try:
+        rows = await run_db(search_item_rows, query, limit + 1, offset, read=True)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    with stage_latency.time("rows", "search_items"):
         return [dict(row) for row in rows]
+
+@app.get("/items/stats")
+async def get_item_stats(days: int = Query(30, ge=0, le=MAX_PAGE_SIZE)):
+    # Served from items_stats and items_daily: the cost does not grow with the table
+    try:
+        return await run_db(select_item_stats, days, read=True)
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-@app.get("/items/{item_id}", response_model=Item)
-def get_item(item_id: int, conn: sqlite3.Connection = Depends(get_db)):
+@app.post("/items/stats/rebuild")
+async def rebuild_stats():
+    # Full scan; for verifying the incremental counters, not for dashboards
     try:
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM items WHERE id = ?', (item_id,))
-        row = cursor.fetchone()
+        before, after = await run_db(rebuild_item_stats)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return {"consistent": same_stats(before, after), "before": before, "after": after}
+
+@app.get("/items/changes")
+async def item_changes(request: Request, since: Optional[str] = None):
+    if not CHANGES_FEED:
+        raise HTTPException(status_code=503,
+                            detail="Change feed is disabled: workers do not share their writes")
+    # EventSource clients resume with Last-Event-ID, others can pass since=
+    if since is None:
+        since = request.headers.get("last-event-id") or None
+    subscription = change_feed.subscribe(since)
+    return StreamingResponse(change_feed.events(subscription, CHANGES_KEEPALIVE),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.get("/items/{item_id}", response_model=Item)
+async def get_item(item_id: int, request: Request):
+    # Cache hits return the stored JSON without touching the database or the model
+    entry = item_cache.get(item_id)
+    if entry is None:
+        try:
+            token = item_cache.token()
+            row = await run_db(select_item_row, item_id, read=True)
+        except sqlite3.Error as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
         if row is None:
             raise HTTPException(status_code=404, detail="Item not found")
 
-        return dict(row)
-    except sqlite3.Error as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        entry = item_cache_entry(row)
+        item_cache.set(item_id, entry, token=token)
+
+    body, validators = entry
+    if not_modified(request, validators):
+        return not_modified_response(validators)
+    return item_response(body, headers=validators)
 
 @app.put("/items/{item_id}", response_model=Item)
-def update_item(item_id: int, item: ItemCreate, conn: sqlite3.Connection = Depends(get_db)):
+async def update_item(item_id: int, item: ItemCreate, response: Response):
     try:
-        cursor = conn.cursor()
-        cursor.execute('''
-        UPDATE items SET name = ?, description = ?, price = ?
-        WHERE id = ?
-        ''', (item.name, item.description, item.price, item_id))
-        conn.commit()
+        row = await run_db(update_item_row, item_id, item)
+        item_cache.invalidate(item_id)
 
-        if cursor.rowcount == 0:
+        if row is None:
             raise HTTPException(status_code=404, detail="Item not found")
 
-        cursor.execute('SELECT * FROM items WHERE id = ?', (item_id,))
-        row = cursor.fetchone()
+        response.headers.update(item_validators(row))
+        change_feed.publish("updated", f'{{"id":{item_id},"item":{render_item(row).decode()}}}')
         return dict(row)
 
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @app.delete("/items/{item_id}")
-def delete_item(item_id: int, conn: sqlite3.Connection = Depends(get_db)):
+async def delete_item(item_id: int):
     try:
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM items WHERE id = ?', (item_id,))
-        conn.commit()
+        deleted = await run_db(delete_item_row, item_id)
+        item_cache.invalidate(item_id)
 
-        if cursor.rowcount == 0:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Item not found")
 
+        change_feed.publish("deleted", f'{{"id":{item_id}}}')
         return {"message": "Item deleted successfully"}
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
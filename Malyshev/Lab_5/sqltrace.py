@@ -0,0 +1,283 @@
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger("auction.sql")
+
+
+def normalize_sql(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def redact(value) -> str:
+    """Describe a bound value without revealing it: type and size only."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (str, bytes, bytearray, memoryview)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def find_caller() -> str:
+    """Return the innermost frame outside this module as file:line in function."""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+class QueryLog:
+    """Per-statement timing, a slow-query log and top-N statement stats.
+
+    Connections are instrumented with ``attach()`` (or opened through
+    ``connect()``) and must be ``TracedConnection`` instances. The progress
+    handler counts virtual machine steps, a proxy for the work a statement
+    did regardless of lock waits, and the trace callback counts the
+    statements SQLite actually ran, including trigger programs and the
+    implicit BEGIN/COMMIT. Its text has the parameters expanded, so it is
+    never stored.
+
+    A statement is timed from execute() until its cursor is exhausted,
+    closed or reused; rows read by iterating the cursor are not timed.
+    Statements slower than ``threshold`` seconds are logged with redacted
+    parameters, their EXPLAIN QUERY PLAN and the calling function, and the
+    last ``top_n`` of them are kept. Aggregates are kept for at most
+    ``max_statements`` distinct SQL texts.
+    """
+
+    def __init__(self, threshold: float = 0.1, top_n: int = 20, max_statements: int = 1000,
+                 explain: bool = True, progress_steps: int = 1000, log: logging.Logger = logger):
+        self.threshold = threshold
+        self.top_n = top_n
+        self.max_statements = max_statements
+        self.explain = explain
+        self.progress_steps = progress_steps
+        self.log = log
+        self._stats = {}
+        self._slow = deque(maxlen=top_n)
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def attach(self, conn: "TracedConnection") -> "TracedConnection":
+        conn.query_log = self
+
+        def progress():
+            conn.vm_steps += self.progress_steps
+            return 0
+
+        def trace(statement):
+            conn.statements += 1
+
+        conn.set_progress_handler(progress, self.progress_steps)
+        conn.set_trace_callback(trace)
+        return conn
+
+    def connect(self, database: str, **kwargs) -> "TracedConnection":
+        return self.attach(sqlite3.connect(database, factory=TracedConnection, **kwargs))
+
+    def record(self, conn: sqlite3.Connection, sql: str, params, elapsed: float,
+               rows: int, vm_steps: int, statements: int, failed: bool = False,
+               caller: Optional[str] = None):
+        key = normalize_sql(sql)
+        slow = elapsed >= self.threshold
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_statements:
+                    # Make room by dropping the statement with the least total time
+                    del self._stats[min(self._stats, key=lambda sql: self._stats[sql]["total"])]
+                    self.evicted += 1
+                entry = self._stats[key] = {"calls": 0, "total": 0.0, "max": 0.0, "rows": 0,
+                                            "vm_steps": 0, "statements": 0, "errors": 0, "slow": 0}
+            entry["calls"] += 1
+            entry["total"] += elapsed
+            entry["max"] = max(entry["max"], elapsed)
+            entry["rows"] += rows
+            entry["vm_steps"] += vm_steps
+            entry["statements"] += statements
+            entry["errors"] += failed
+            entry["slow"] += slow
+        if not slow:
+            return
+
+        plan = self.query_plan(conn, sql, params) if self.explain else []
+        slow_query = {
+            "sql": key,
+            "params": [redact(value) for value in params] if not isinstance(params, dict)
+            else {name: redact(value) for name, value in params.items()},
+            "ms": round(elapsed * 1000, 3),
+            "rows": rows,
+            "vm_steps": vm_steps,
+            "caller": caller or find_caller(),
+            "plan": plan,
+            "at": time.time(),
+        }
+        with self._lock:
+            self._slow.append(slow_query)
+        self.log.warning("slow query %.1f ms at %s: %s params=%s plan=%s", slow_query["ms"],
+                         slow_query["caller"], key, slow_query["params"], "; ".join(plan) or "-")
+
+    @staticmethod
+    def query_plan(conn: sqlite3.Connection, sql: str, params) -> list:
+        # A plain cursor, so that the EXPLAIN is not traced itself
+        try:
+            cursor = sqlite3.Cursor(conn)
+            cursor.row_factory = None
+            return [row[3] for row in cursor.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        except (sqlite3.Error, ValueError):
+            return []
+
+    def top(self, n: Optional[int] = None, order: str = "total") -> list:
+        """Aggregated stats of the ``n`` most expensive statements by ``order``."""
+        if order not in ("total", "calls", "max", "avg", "vm_steps"):
+            raise ValueError(f"Unknown order: {order}")
+        with self._lock:
+            entries = [dict(stats, sql=sql) for sql, stats in self._stats.items()]
+
+        def sort_key(entry):
+            return entry["total"] / entry["calls"] if order == "avg" else entry[order]
+        entries.sort(key=sort_key, reverse=True)
+        return [{
+            "sql": entry["sql"],
+            "calls": entry["calls"],
+            "total_ms": round(entry["total"] * 1000, 3),
+            "avg_ms": round(entry["total"] / entry["calls"] * 1000, 3),
+            "max_ms": round(entry["max"] * 1000, 3),
+            "rows": entry["rows"],
+            "vm_steps": entry["vm_steps"],
+            "statements": entry["statements"],
+            "errors": entry["errors"],
+            "slow": entry["slow"],
+        } for entry in entries[:n or self.top_n]]
+
+    def slow_queries(self) -> list:
+        with self._lock:
+            return list(self._slow)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self.evicted = 0
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement to the query log of its connection."""
+
+    _pending = None
+
+    def execute(self, sql: str, parameters=()):
+        self._finish()
+        return self._start(super().execute, sql, parameters, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters):
+        self._finish()
+        first = []
+
+        def capture():
+            # Keep the first parameter set for EXPLAIN without materialising the rest
+            for parameters in seq_of_parameters:
+                if not first:
+                    first.append(parameters)
+                yield parameters
+        self._start(super().executemany, sql, capture(), first)
+        return self
+
+    def _start(self, method, sql: str, argument, params):
+        conn = self.connection
+        if getattr(conn, "query_log", None) is None:
+            return method(sql, argument)
+        # The statement may only be finished after the caller has returned
+        caller = find_caller()
+        steps, statements = conn.vm_steps, conn.statements
+        started = time.perf_counter()
+        try:
+            method(sql, argument)
+        except BaseException:
+            self._pending = [sql, params, time.perf_counter() - started, 0, steps, statements, caller]
+            self._finish(failed=True)
+            raise
+        self._pending = [sql, params, time.perf_counter() - started, 0, steps, statements, caller]
+        if self.description is None:
+            self._finish()
+        return self
+
+    def _finish(self, failed: bool = False):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, elapsed, rows, steps, statements, caller = pending
+        conn = self.connection
+        if self.description is None and self.rowcount > 0:
+            rows = self.rowcount
+        if isinstance(params, list) and params and isinstance(params[0], (tuple, list, dict)):
+            params = params[0]  # executemany: the captured first parameter set
+        elif isinstance(params, list) and not params:
+            params = ()
+        conn.query_log.record(conn, sql, params, elapsed, rows,
+                              conn.vm_steps - steps, conn.statements - statements, failed, caller)
+
+    def _timed(self, fetch, *args):
+        started = time.perf_counter()
+        result = fetch(*args)
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - started
+        return result
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._pending is not None:
+            self._pending[3] += 1
+        return row
+
+    def fetchmany(self, size: Optional[int] = None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors are timed by a QueryLog once attached."""
+
+    query_log: Optional[QueryLog] = None
+    vm_steps = 0
+    statements = 0
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or TracedCursor)
+
+    def execute(self, sql: str, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
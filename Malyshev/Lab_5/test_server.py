@@ -0,0 +1,614 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+os.environ.setdefault("AUCTION_DB", os.path.join(tempfile.mkdtemp(), "auction.db"))
+
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+import server
+from changes import ChangeFeed
+from db import ConnectionPool, PoolTimeout, WriteBatcher
+from metrics import Counter, Histogram
+from migrations import MIGRATIONS, REBUILD_ITEM_STATS, migrate, migrate_database, schema_version
+from profile_startup import time_to_first_response
+from sqltrace import QueryLog
+
+
+@pytest.fixture(params=["sync", "async"])
+def client(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "DB_BACKEND", request.param)
+    monkeypatch.setattr(server, "DATABASE", str(tmp_path / "auction.db"))
+    with TestClient(server.app) as client:
+        yield client
+
+
+def test_item_crud(client):
+    response = client.post("/items/", json={"name": "Watch", "description": "Old", "price": 150.5})
+    assert response.status_code == 201
+    item = response.json()
+    assert item["name"] == "Watch"
+
+    assert client.get(f"/items/{item['id']}").json() == item
+    assert [i["id"] for i in client.get("/items/").json()] == [item["id"]]
+
+    response = client.put(f"/items/{item['id']}", json={"name": "Watch", "price": 99})
+    assert response.json()["price"] == 99
+
+    assert client.delete(f"/items/{item['id']}").status_code == 200
+    assert client.get(f"/items/{item['id']}").status_code == 404
+
+
+def test_write_paths_without_returning(client, monkeypatch):
+    monkeypatch.setattr(server, "HAS_RETURNING", False)
+    item = client.post("/items/", json={"name": "Lot", "price": 1}).json()
+    assert client.put(f"/items/{item['id']}", json={"name": "Lot", "price": 2}).json()["price"] == 2
+    assert client.put("/items/999", json={"name": "Lot", "price": 2}).status_code == 404
+
+
+def test_keyset_pagination_and_streaming(client):
+    ids = [client.post("/items/", json={"name": f"Lot {i}", "price": i}).json()["id"] for i in range(7)]
+    expected = sorted(ids, reverse=True)  # same created_at second, so id breaks the tie
+
+    seen, after = [], None
+    while True:
+        params = {"limit": 3} if after is None else {"limit": 3, "after": after}
+        response = client.get("/items/", params=params)
+        seen += [item["id"] for item in response.json()]
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+    assert seen == expected
+
+    response = client.get("/items/", params={"stream": "ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == expected
+    response = client.get("/items/", params={"stream": "json", "limit": 2})
+    assert [item["id"] for item in response.json()] == expected[:2]
+
+    assert client.get("/items/", params={"after": "not-a-cursor"}).status_code == 400
+
+
+def test_fast_json_matches_model_rendering(client, monkeypatch):
+    for item in [{"name": "Часы \"Заря\"", "description": None, "price": 150.5},
+                 {"name": "Lot\n\u2028", "description": "😀 & <b>", "price": 0.1},
+                 {"name": "Big", "description": "", "price": 1e16},
+                 {"name": "Whole", "price": 3}]:
+        client.post("/items/", json=item)
+
+    for params in ({}, {"limit": 2}, {"limit": 10}):
+        slow = client.get("/items/", params=params)
+        monkeypatch.setattr(server, "FAST_JSON", True)
+        fast = client.get("/items/", params=params)
+        monkeypatch.setattr(server, "FAST_JSON", False)
+        assert fast.content == slow.content
+        assert fast.headers.get("X-Next-Cursor") == slow.headers.get("X-Next-Cursor")
+
+
+def test_filtered_sorted_listing(client):
+    client.post("/items/bulk", json=[{"name": name, "description": "x" * 100, "price": price}
+                                     for name, price in [("Watch", 30), ("Watch strap", 5), ("Vase", 20),
+                                                         ("Watchtower", 50), ("Lamp", 20), ("Wax", 10)]])
+
+    seen, after = [], None
+    while True:
+        params = {"min_price": 10, "max_price": 30, "sort": "price", "order": "asc", "limit": 2}
+        response = client.get("/items/", params=params if after is None else {**params, "after": after})
+        seen += [(item["name"], item["price"]) for item in response.json()]
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+    assert seen == [("Wax", 10), ("Vase", 20), ("Lamp", 20), ("Watch", 30)]
+
+    response = client.get("/items/", params={"name_prefix": "Watch", "sort": "price", "order": "desc"})
+    assert [item["name"] for item in response.json()] == ["Watchtower", "Watch", "Watch strap"]
+
+    response = client.get("/items/", params={"fields": "price,name", "sort": "price", "limit": 1})
+    assert response.json() == [{"name": "Watchtower", "price": 50.0}]
+    response = client.get("/items/", params={"fields": "price,name", "sort": "price", "limit": 1,
+                                             "after": response.headers["X-Next-Cursor"]})
+    assert response.json() == [{"name": "Watch", "price": 30.0}]
+    response = client.get("/items/", params={"fields": "id", "max_price": 5, "stream": "ndjson"})
+    assert list(json.loads(response.text)) == ["id"]
+
+    assert client.get("/items/", params={"fields": "id,secret"}).status_code == 400
+    assert client.get("/items/", params={"min_price": 5, "max_price": 1}).status_code == 400
+    assert client.get("/items/", params={"sort": "name"}).status_code == 422
+
+
+def test_listing_queries_use_indexes(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "plan.db"))
+    migrate(conn)
+    cursor = server.encode_cursor(10.0, 1)
+    # Filtered pages must SEARCH an index. The index named in the third
+    # field may be SCANned instead, in ORDER BY order until LIMIT rows are
+    # found: for unfiltered pages, and for min_price under the default
+    # created_at sort, where the planner checks price on each entry of
+    # idx_items_created_at (which carries it) rather than sort the range
+    cases = [
+        ({}, None, "idx_items_created_at"),
+        ({}, server.encode_cursor("2024-01-01 00:00:00", 1), None),
+        ({"sort": "price", "order": "asc"}, None, "idx_items_price"),
+        ({"min_price": 10, "max_price": 20, "sort": "price"}, cursor, None),
+        ({"min_price": 10}, None, "idx_items_created_at"),
+        ({"name_prefix": "Watch"}, None, None),
+        ({"name_prefix": "Watch", "max_price": 20, "sort": "price"}, cursor, None),
+    ]
+    for filters, after, scanned in cases:
+        for columns, covering in (("*", False), ("id, name, price", True)):
+            sql, params = server.items_page_query(after, 50, columns, **filters)
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+            if scanned:
+                assert len(plan) == 1, (sql, plan)
+                assert re.fullmatch(f"SCAN items USING (COVERING )?INDEX {scanned}", plan[0]), (sql, plan)
+            else:
+                assert all(step.startswith("SEARCH items USING ") or step == "USE TEMP B-TREE FOR ORDER BY"
+                           for step in plan), (sql, plan)
+            assert not covering or "COVERING INDEX" in plan[0], (sql, plan)
+            if filters.get("sort") == "price" and "name_prefix" not in filters:
+                assert not any("TEMP B-TREE" in step for step in plan), (sql, plan)
+
+
+def test_item_stats_follow_writes(client, monkeypatch):
+    empty = client.get("/items/stats").json()
+    assert empty == {"count": 0, "min_price": None, "max_price": None, "avg_price": None,
+                     "total_price": 0.0, "days": []}
+
+    monkeypatch.setattr(server, "BULK_CHUNK_SIZE", 2)
+    client.post("/items/bulk", json=[{"name": "Lot", "price": price} for price in (5, 10, 15)])
+    cheapest = client.post("/items/", json={"name": "Cheap", "price": 1}).json()
+    priciest = client.post("/items/", json={"name": "Dear", "price": 100}).json()
+    client.put(f"/items/{priciest['id']}", json={"name": "Dear", "price": 50})
+    client.delete(f"/items/{cheapest['id']}")
+
+    stats = client.get("/items/stats").json()
+    assert (stats["count"], stats["min_price"], stats["max_price"]) == (4, 5, 50)
+    assert stats["avg_price"] == pytest.approx(20)
+    assert [day["count"] for day in stats["days"]] == [4]
+
+    rebuilt = client.post("/items/stats/rebuild").json()
+    assert rebuilt["consistent"] and rebuilt["after"]["count"] == 4
+
+    with sqlite3.connect(server.DATABASE) as conn:
+        conn.execute("UPDATE items_stats SET item_count = 99")
+    assert client.post("/items/stats/rebuild").json()["consistent"] is False
+    assert client.get("/items/stats").json()["count"] == 4
+
+
+def test_item_stats_count_every_writer(tmp_path):
+    conn = sqlite3.connect(tmp_path / "stats.db")
+    migrate(conn)
+    with conn:
+        conn.executemany("INSERT INTO items (name, price) VALUES (?, ?)", [("Lot", 5), ("Lot", 7)])
+        conn.execute("DELETE FROM items WHERE price = 5")
+        conn.execute("INSERT INTO items (name, price) VALUES ('Lot', 3)")
+    stats = conn.execute("SELECT * FROM items_stats").fetchall()
+    daily = conn.execute("SELECT * FROM items_daily").fetchall()
+    with conn:
+        for statement in REBUILD_ITEM_STATS:
+            conn.execute(statement)
+    assert stats == conn.execute("SELECT * FROM items_stats").fetchall() == [(1, 2, 10.0, 3.0, 7.0)]
+    assert daily == conn.execute("SELECT * FROM items_daily").fetchall()
+    conn.close()
+
+
+def test_metrics_endpoint(client, monkeypatch):
+    item_id = client.post("/items/", json={"name": "Lot", "price": 5}).json()["id"]
+    client.get(f"/items/{item_id}")
+    client.get("/items/", params={"limit": 10})
+
+    def select_item_row(conn, item_id):
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(server, "select_item_row", select_item_row)
+    server.item_cache.clear()
+    assert client.get(f"/items/{item_id}").status_code == 500
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'auction_http_requests_total{method="GET",route="/items/{item_id}",status="200"}' in text
+    assert 'auction_http_requests_total{method="GET",route="/items/{item_id}",status="500"}' in text
+    assert 'auction_db_errors_total{operation="select_item_row"}' in text
+    assert 'auction_http_request_duration_seconds_bucket{method="POST",route="/items/",le="+Inf"}' in text
+    assert 'auction_stage_duration_seconds_count{stage="sql",operation="insert_item_row"}' in text
+    assert 'auction_stage_duration_seconds_count{stage="rows",operation="get_items"}' in text
+    assert 'auction_http_requests_in_flight{method="GET"} 1' in text  # the scrape itself
+
+
+def test_metrics_are_bounded():
+    counter = Counter("requests_total", "Requests.", ["path"], max_series=2)
+    for path in ("/a", "/b", "/c", "/d"):
+        counter.inc(path)
+    assert counter.value("other") == 2
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    assert histogram.render().splitlines()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 1', 'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3', 'latency_seconds_sum 5.55', 'latency_seconds_count 3']
+
+
+def test_query_log(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(server, "DATABASE", str(tmp_path / "auction.db"))
+    monkeypatch.setattr(server, "query_log", QueryLog(threshold=0.0, top_n=50))
+    with TestClient(server.app) as client:
+        item_id = client.post("/items/", json={"name": "Secret name", "price": 5}).json()["id"]
+        client.get("/items/", params={"min_price": 1, "sort": "price"})
+        stats = client.get("/queries/stats", params={"order": "calls"}).json()
+
+    assert stats["enabled"] and stats["threshold_ms"] == 0
+    insert = next(entry for entry in stats["top"] if entry["sql"].startswith("INSERT INTO items "))
+    assert insert["calls"] == 1 and insert["rows"] == 1 and insert["statements"] >= 1
+    slow = next(entry for entry in stats["slow"] if entry["sql"] == insert["sql"])
+    assert slow["params"] == ["<str:11>", "NULL", "<float>"]
+    assert slow["caller"].startswith("server.py:") and slow["caller"].endswith("in insert_item_row")
+    listing = next(entry for entry in stats["slow"] if "ORDER BY price" in entry["sql"])
+    assert any("idx_items_price" in step for step in listing["plan"])
+    assert "Secret name" not in caplog.text and "slow query" in caplog.text
+
+
+def test_conditional_requests(client):
+    item = client.post("/items/", json={"name": "Lot", "price": 1})
+    etag = item.headers["ETag"]
+    response = client.get(f"/items/{item.json()['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+    last_modified = response.headers["Last-Modified"]
+    assert client.get(f"/items/{item.json()['id']}",
+                      headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    updated = client.put(f"/items/{item.json()['id']}", json={"name": "Lot", "price": 2})
+    assert updated.headers["ETag"] != etag
+    response = client.get(f"/items/{item.json()['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.json()["price"] == 2
+
+    listing = client.get("/items/")
+    assert client.get("/items/", headers={"If-None-Match": listing.headers["ETag"]}).status_code == 304
+    assert client.get("/items/", params={"limit": 1},
+                      headers={"If-None-Match": listing.headers["ETag"]}).status_code == 200
+    client.post("/items/bulk", json=[{"name": "Other", "price": 3}])
+    assert client.get("/items/", headers={"If-None-Match": listing.headers["ETag"]}).status_code == 200
+
+    # Writes that bypass the app move the collection version too
+    for statement in ("INSERT INTO items (name, price) VALUES ('Outside', 4)",
+                      "UPDATE items SET price = 5 WHERE name = 'Outside'",
+                      "DELETE FROM items WHERE name = 'Outside'"):
+        etag = client.get("/items/").headers["ETag"]
+        with sqlite3.connect(server.DATABASE) as conn:
+            conn.execute(statement)
+        assert client.get("/items/", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_item_cache_hits_and_invalidation(client):
+    before = client.get("/cache/stats").json()
+    item_id = client.post("/items/", json={"name": "Lot", "price": 5}).json()["id"]
+    first = client.get(f"/items/{item_id}")
+    assert client.get(f"/items/{item_id}").content == first.content
+    assert client.get("/cache/stats").json()["hits"] == before["hits"] + 2
+
+    # PUT still renders through response_model; the cached bytes must match it
+    updated = client.put(f"/items/{item_id}", json={"name": "Lot", "description": "Ünïcode", "price": 7.25})
+    assert client.get(f"/items/{item_id}").content == updated.content
+    assert client.get("/cache/stats").json()["misses"] == before["misses"] + 1
+
+    client.delete(f"/items/{item_id}")
+    assert client.get(f"/items/{item_id}").status_code == 404
+
+
+def test_bulk_insert(client, monkeypatch):
+    monkeypatch.setattr(server, "BULK_CHUNK_SIZE", 4)
+    rows = [{"name": f"Lot {i}", "price": i} for i in range(10)]
+    result = client.post("/items/bulk", json=rows).json()
+    assert result["inserted"] == 10 and result["errors"] == []
+    assert client.get(f"/items/{result['ids'][-1]}").json()["name"] == "Lot 9"
+
+    # All-or-nothing: one bad row rejects the whole load
+    response = client.post("/items/bulk", json=rows[:5] + [{"name": "Bad", "price": -1}])
+    assert response.status_code == 422
+    assert len(client.get("/items/").json()) == 10
+
+    body = "\n".join(json.dumps(row) for row in rows[:5]) + "\n{oops}\n" + json.dumps({"name": "x"})
+    response = client.post("/items/bulk", params={"atomic": "false"}, content=body,
+                           headers={"content-type": "application/x-ndjson"})
+    result = response.json()
+    assert result["inserted"] == 5
+    assert [error["index"] for error in result["errors"]] == [5, 6]
+    assert len(client.get("/items/").json()) == 15
+
+    # A chunk SQLite rejects (NaN is stored as NULL) is retried row by row
+    body = "\n".join([json.dumps({"name": "Lot 15", "price": 15}), '{"name": "NaN", "price": NaN}'])
+    response = client.post("/items/bulk", params={"atomic": "false"}, content=body,
+                           headers={"content-type": "application/x-ndjson"})
+    result = response.json()
+    assert result["inserted"] == 1 and [error["index"] for error in result["errors"]] == [1]
+
+    # Chunks are indexed and counted by range with the insert triggers
+    # switched off, which must not outlive the load
+    with sqlite3.connect(server.DATABASE) as conn:
+        assert conn.execute("SELECT bulk_load FROM items_state").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM items_fts WHERE items_fts MATCH 'lot'").fetchone()[0] == 16
+        conn.execute("INSERT INTO items_fts (items_fts) VALUES ('integrity-check')")
+    assert client.post("/items/stats/rebuild").json()["consistent"]
+
+
+def test_atomic_bulk_insert_takes_the_write_lock_after_the_upload(client, monkeypatch):
+    monkeypatch.setattr(server, "BULK_CHUNK_SIZE", 2)
+    parts = [b"".join(json.dumps({"name": f"Lot {i}", "price": i}).encode() + b"\n" for i in range(n, n + 3))
+             for n in (0, 3)]
+    lock_free = []
+
+    # A slow client: other writers must get the lock between its chunks
+    async def receive():
+        with sqlite3.connect(server.DATABASE, timeout=0) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            lock_free.append(True)
+        body = parts.pop(0)
+        return {"type": "http.request", "body": body, "more_body": bool(parts)}
+
+    request = Request({"type": "http", "method": "POST", "query_string": b"",
+                       "headers": [(b"content-type", b"application/x-ndjson")]}, receive)
+    result = asyncio.run(server.create_items_bulk(request))
+    assert result["inserted"] == 6 and lock_free == [True, True]
+
+
+def test_change_feed_resume(client):
+    seq = server.change_feed.seq
+    item_id = client.post("/items/", json={"name": "Lot", "price": 1}).json()["id"]
+    client.put(f"/items/{item_id}", json={"name": "Lot", "price": 2})
+    client.delete(f"/items/{item_id}")
+
+    # The stream never ends on its own, so read it straight from the endpoint
+    async def read_events():
+        request = Request({"type": "http", "query_string": b"",
+                           "headers": [(b"last-event-id", server.change_feed.event_id(seq).encode())]})
+        response = await server.item_changes(request)
+        assert response.media_type == "text/event-stream"
+        messages = [await response.body_iterator.__anext__() for _ in range(3)]
+        await response.body_iterator.aclose()
+        return [message.split("\n")[1][len("event: "):] for message in messages]
+
+    events = asyncio.run(read_events())
+    assert events == ["created", "updated", "deleted"]
+
+
+def test_change_feed_can_be_disabled(client, monkeypatch):
+    monkeypatch.setattr(server, "CHANGES_FEED", False)
+    assert client.get("/items/changes").status_code == 503
+
+
+def test_change_feed_backpressure():
+    async def scenario():
+        feed = ChangeFeed(history=3, queue_size=2)
+        slow = feed.subscribe()
+        for i in range(5):
+            feed.publish("created", f'{{"id":{i}}}')
+        messages = [m async for m in feed.events(slow, keepalive=0.1)]
+        assert messages[-1].startswith("event: overflow")
+        assert feed.stats()["dropped"] == 1 and feed.stats()["subscribers"] == 0
+
+        # Resuming inside the history replays the missed events, older ids reset
+        assert [m.split("\n")[0] for m in feed.subscribe(since=feed.event_id(3)).backlog] == \
+            [f"id: {feed.event_id(4)}", f"id: {feed.event_id(5)}"]
+        assert feed.subscribe(since=3).backlog == feed.subscribe(since=feed.event_id(3)).backlog
+        assert feed.subscribe(since=feed.event_id(5)).backlog == []
+        assert "event: reset" in feed.subscribe(since=0).backlog[0]
+
+        # Ids the feed cannot have issued: ahead of it (the process restarted
+        # and counts from 1 again), from another epoch, or malformed
+        restarted = ChangeFeed(history=3)
+        restarted.publish("created", '{"id":6}')
+        for stale in (feed.event_id(5), 5, f"{feed.epoch}-1", "-1", "latest"):
+            assert "event: reset" in restarted.subscribe(since=stale).backlog[0]
+
+    asyncio.run(scenario())
+
+
+def test_full_text_search(client):
+    client.post("/items/", json={"name": "Vintage watch", "description": "Swiss made", "price": 100})
+    client.post("/items/", json={"name": "Clock", "description": "Like a vintage watch, but bigger", "price": 50})
+    chair = client.post("/items/", json={"name": "Chair", "description": "Oak", "price": 20}).json()
+
+    results = client.get("/items/search", params={"q": "vintage wat"}).json()
+    assert [r["name"] for r in results] == ["Vintage watch", "Clock"]
+    assert "<mark>" in results[0]["snippet"]
+
+    page = client.get("/items/search", params={"q": "watch", "limit": 1})
+    assert len(page.json()) == 1 and page.headers["X-Next-Offset"] == "1"
+
+    # Triggers keep the index in step with updates and deletes
+    client.put(f"/items/{chair['id']}", json={"name": "Vintage chair", "price": 20})
+    assert len(client.get("/items/search", params={"q": "vintage"}).json()) == 3
+    client.delete(f"/items/{chair['id']}")
+    assert len(client.get("/items/search", params={"q": "vintage"}).json()) == 2
+    assert client.get("/items/search", params={"q": '" OR NEAR('}).json() == []
+
+    client.post("/items/bulk", json=[{"name": "Vintage lamp", "price": 5}, {"name": "Rug", "price": 5}])
+    assert len(client.get("/items/search", params={"q": "vintage"}).json()) == 3
+
+
+def test_full_text_index_covers_every_writer(tmp_path):
+    conn = sqlite3.connect(tmp_path / "fts.db")
+    migrate(conn)
+    # Written around the app: the trigger indexes it, so the update and
+    # delete triggers find the entries they remove
+    with conn:
+        conn.execute("INSERT INTO items (name, description, price) VALUES ('Brass lamp', 'Old', 5)")
+    with conn:
+        conn.execute("UPDATE items SET name = 'Copper lamp' WHERE id = 1")
+    assert conn.execute("SELECT rowid FROM items_fts WHERE items_fts MATCH 'copper'").fetchall() == [(1,)]
+    with conn:
+        conn.execute("DELETE FROM items WHERE id = 1")
+    conn.execute("INSERT INTO items_fts (items_fts) VALUES ('integrity-check')")
+    conn.close()
+
+
+def test_pool_reuses_connections(client):
+    for _ in range(20):
+        client.post("/items/", json={"name": "Lot", "price": 1})
+    stats = client.get("/pool/stats").json()
+    assert stats["healthy"] is True
+    assert stats["open"] <= stats["size"]
+    if server.DB_BACKEND == "async":
+        assert stats["executor"]["completed"] == 20
+    else:
+        assert stats["acquired"] >= 21
+
+
+def test_storage_profile_and_read_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "DATABASE", str(tmp_path / "auction.db"))
+    monkeypatch.setattr(server, "READ_POOL_SIZE", 2)
+    with TestClient(server.app) as client:
+        client.post("/items/", json={"name": "Lot", "price": 1})
+        assert len(client.get("/items/").json()) == 1
+
+        with server.read_pool.connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM items")
+        assert client.get("/pool/stats").json()["read_pool"]["acquired"] >= 2
+
+
+def test_group_commit_endpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "DATABASE", str(tmp_path / "auction.db"))
+    monkeypatch.setattr(server, "GROUP_COMMIT", True)
+    with TestClient(server.app) as client:
+        item_id = client.post("/items/", json={"name": "Lot", "price": 1}).json()["id"]
+        assert client.put(f"/items/{item_id}", json={"name": "Lot", "price": 2}).json()["price"] == 2
+        assert client.delete(f"/items/{item_id}").status_code == 200
+        assert client.delete(f"/items/{item_id}").status_code == 404
+        assert client.get("/pool/stats").json()["write_queue"]["jobs"] == 4
+
+
+def test_write_batcher_isolates_failures(tmp_path):
+    path = str(tmp_path / "batch.db")
+    with sqlite3.connect(path) as conn:
+        migrate(conn)
+
+    def insert(conn, price):
+        return conn.execute("INSERT INTO items (name, price) VALUES ('Lot', ?)", (price,)).lastrowid
+
+    batcher = WriteBatcher(path, max_batch_size=100, max_linger=0.05)
+    futures = [batcher.submit(insert, price) for price in (1, 2, -1, 3)]
+    batcher.close()
+
+    assert [f.result() for f in futures[:2]] + [futures[3].result()] == [1, 2, 3]
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[2].result()
+    stats = batcher.stats()
+    assert stats["batches"] == 1 and stats["jobs"] == 4 and stats["failed"] == 1
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 3
+
+
+def test_migrations_are_versioned_and_idempotent(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"))
+    assert migrate(conn, MIGRATIONS[:1]) == 1
+    conn.execute("INSERT INTO items (name, price) VALUES ('Lot', 1)")
+    conn.commit()
+
+    assert migrate(conn) == MIGRATIONS[-1].version
+    assert migrate(conn) == schema_version(conn)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM items ORDER BY created_at DESC, id DESC LIMIT 10").fetchall()
+    assert "USING INDEX idx_items_created_at" in plan[0][3]
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+
+
+def test_concurrent_processes_migrate_once(tmp_path):
+    path = str(tmp_path / "shared.db")
+    with multiprocessing.get_context("fork").Pool(4) as workers:
+        versions = workers.starmap(migrate_database, [(path, server.STORAGE_PROFILE)] * 8)
+    assert versions == [MIGRATIONS[-1].version] * 8
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_prefork_supervisor_reload_and_shutdown(tmp_path):
+    supervisor = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", "1", "--port", "0", "--db", str(tmp_path / "served.db"),
+         "--log-level", "warning", "--graceful-timeout", "5"],
+        cwd=os.path.dirname(os.path.abspath(server.__file__)), stderr=subprocess.PIPE, text=True,
+        env=dict(os.environ, AUCTION_ITEM_CACHE_SIZE="1000"))
+    try:
+        url = re.search(r"http://[\d.]+:\d+", supervisor.stderr.readline()).group(0)
+
+        def get(path):
+            for _ in range(100):
+                try:
+                    with urllib.request.urlopen(url + path, timeout=5) as response:
+                        return json.load(response)
+                except OSError:
+                    threading.Event().wait(0.1)
+            raise AssertionError("server did not answer")
+
+        def send(method, path, item):
+            request = urllib.request.Request(url + path, data=json.dumps(item).encode(), method=method,
+                                             headers={"content-type": "application/json"})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return json.load(response)
+
+        assert get("/items/stats")["count"] == 0
+        # SIGTTIN may add workers later, so even a single worker runs
+        # without the per-process cache and change feed, whatever the
+        # operator's environment asks for
+        supervisor.send_signal(signal.SIGTTIN)
+        assert get("/cache/stats")["max_size"] == 0
+        item_id = send("POST", "/items/", {"name": "Lot", "price": 0})["id"]
+        for price in range(1, 11):
+            get(f"/items/{item_id}")
+            send("PUT", f"/items/{item_id}", {"name": "Lot", "price": price})
+            assert get(f"/items/{item_id}")["price"] == price
+        with pytest.raises(urllib.error.HTTPError) as refused:
+            urllib.request.urlopen(url + "/items/changes", timeout=5)
+        assert refused.value.code == 503
+        supervisor.send_signal(signal.SIGHUP)
+        assert [item["id"] for item in get("/items/")] == [item_id]
+        supervisor.send_signal(signal.SIGTERM)
+        assert supervisor.wait(timeout=15) == 0
+    finally:
+        supervisor.kill()
+        supervisor.stderr.close()
+
+
+def test_import_defers_database_and_optional_modules(tmp_path):
+    database = tmp_path / "lazy.db"
+    subprocess.run([sys.executable, "-c", "import server, sys; sys.exit('sqltrace' in sys.modules)"],
+                   cwd=os.path.dirname(os.path.abspath(server.__file__)), check=True,
+                   env=dict(os.environ, AUCTION_DB=str(database), AUCTION_QUERY_LOG="0"))
+    assert not database.exists()
+
+
+def test_cold_start_budget(tmp_path):
+    # Interpreter startup, imports, lifespan and the first request
+    budget = float(os.environ.get("AUCTION_COLD_START_BUDGET", "3"))
+    elapsed = time_to_first_response(str(tmp_path / "cold.db"))
+    assert elapsed < budget, f"first response after {elapsed:.2f}s, budget {budget:.2f}s"
+
+
+def test_pool_is_bounded(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2, pragmas={"busy_timeout": 1000})
+    first, second = pool.acquire(), pool.acquire()
+    assert first.execute("PRAGMA busy_timeout").fetchone()[0] == 1000
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.05)
+
+    threading.Timer(0.05, pool.release, (first,)).start()
+    assert pool.acquire(timeout=1) is first
+    assert pool.stats()["waited"] == 1
+    assert pool.stats()["timeouts"] == 1
+
+    pool.release(first)
+    pool.release(second)
+    pool.close()
+    assert pool.stats()["open"] == 0